@@ -321,18 +321,19 @@ class CGM(object):
 
 
 
-    def dumpBG(self, n = None):
+    def dumpBG(self, n = None, sync = False):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             DUMPBG
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             To dump about 24 h of CGM readings: 8 pages (38 records per page,
-            separated by 5 m intervals)
+            separated by 5 m intervals). When syncing, only readings more
+            recent than the ones of the last sync are read.
         """
 
         # Read BGs
-        self.databases["BG"].read(n)
+        self.databases["BG"].read(n, sync)
 
 
 
@@ -25,12 +25,15 @@
 # USER LIBRARIES
 import lib
 import logger
+import errors
+import metrics
 import packets
 
 
 
-# Instanciate logger
+# Define instances
 Logger = logger.Logger("CGM/commands.py")
+Metrics = metrics.Metrics()
 
 
 
@@ -53,6 +56,9 @@ class Command(object):
         # Initialize command page byte
         self.page = None
 
+        # Initialize number of pages to read
+        self.n = 1
+
         # Initialize command response
         self.response = None
 
@@ -72,13 +78,16 @@ class Command(object):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
+        # Start timer
+        t0 = Metrics.now()
+
         # Reset response
         self.response = {"Head": None,
                          "Payload": None,
                          "CRC": None}
 
         # Prepare packet
-        self.packet.build(self.code, self.database, self.page)
+        self.packet.build(self.code, self.database, self.page, self.n)
 
         # Send packet
         self.cgm.write(self.packet.bytes)
@@ -90,10 +99,10 @@ class Command(object):
         size = lib.unpack(data[1:3], "<")
 
         # Until whole data collected
-        while len(data) != size:
+        while len(data) < size:
 
-            # Read more data
-            data.extend(self.cgm.read())
+            # Read all remaining data at once (in multiples of 64 bytes)
+            data.extend(self.cgm.read(64 * ((size - len(data) - 1) / 64 + 1)))
 
         # Head
         self.response["Head"] = data[0:4]
@@ -110,6 +119,9 @@ class Command(object):
         # Verify response
         self.verify()
 
+        # Update command timer
+        Metrics.time("CGM " + self.__class__.__name__, t0)
+
 
 
     def verify(self):
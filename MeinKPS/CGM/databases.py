@@ -25,13 +25,16 @@
 # USER LIBRARIES
 import lib
 import logger
+import errors
+import reporter
 import commands
 import records
 
 
 
-# Instanciate logger
+# Define instances
 Logger = logger.Logger("CGM/databases.py")
+Reporter = reporter.Reporter()
 
 
 
@@ -63,6 +66,21 @@ class Database(object):
         # Define response head size
         self.headSize = 28
 
+        # Define page size
+        self.pageSize = 528
+
+        # Define max packet size of receiver
+        self.packetSize = 1590
+
+        # Define max number of pages to read per command
+        self.batch = self.packetSize / self.pageSize
+
+        # Initialize database cursor (last page read and last record time)
+        self.cursor = None
+
+        # Define report
+        self.report = "CGM.json"
+
         # Define empty range response
         self.emptyRange = [lib.unpack([255] * 4, "<")] * 2
 
@@ -118,6 +136,41 @@ class Database(object):
 
 
 
+    def head(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            HEAD
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return position of newest record (last page and number of records
+            in it), without decoding anything. Cheap way to know if database
+            changed.
+        """
+
+        # Read database range
+        if not self.measure():
+
+            # Exit
+            return None
+
+        # Link to read database command
+        command = self.commands["ReadDatabase"]
+
+        # Tell command which database to read from
+        command.database = self.code
+
+        # Only read last page
+        command.page = self.range[1]
+        command.n = 1
+
+        # Read it
+        command.execute()
+
+        # Return last page and its number of records
+        return [self.range[1], command.response["Payload"][4]]
+
+
+
     def parse(self, bytes):
 
         """
@@ -152,17 +205,81 @@ class Database(object):
 
 
 
-    def read(self, n = None):
+    def load(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            LOAD
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Load database cursor from last sync.
+        """
+
+        # Try
+        try:
+
+            # Get cursor
+            self.cursor = Reporter.get(self.report, ["Cursors"],
+                                       self.__class__.__name__)
+
+        # Otherwise
+        except (errors.NoReport, errors.NoSection):
+
+            # No cursor
+            self.cursor = None
+
+        # Cursor without system time (stored by an older version)
+        if self.cursor is not None and "System" not in self.cursor:
+
+            # Ignore it
+            self.cursor = None
+
+        # Cursor found
+        if self.cursor is not None:
+
+            # Give user info
+            Logger.debug("Database cursor: page " + str(self.cursor["Page"]) +
+                         " (system time: " + str(self.cursor["System"]) + ")")
+
+
+
+    def store(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            STORE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Store database cursor for next sync.
+        """
+
+        # Give user info
+        Logger.debug("Storing database cursor to report: '" + self.report +
+                     "'...")
+
+        # Add entry
+        Reporter.add(self.report, ["Cursors"],
+                     {self.__class__.__name__:
+                      {"Page": self.cursor["Page"],
+                       "System": self.cursor["System"]}}, True)
+
+
+
+    def read(self, n = None, sync = False):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             READ
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            When syncing, only pages starting from the one the cursor points to
+            are read, and only records more recent than the cursor's system
+            time are decoded.
         """
 
         # Reset database data
         self.data = []
 
+        # Reset cursor
+        self.cursor = None
+
         # Read database range and read database if not empty
         if self.measure():
 
@@ -176,36 +293,99 @@ class Database(object):
                 # Assign new limit
                 start = end - n
 
+            # If syncing records
+            if sync and self.record is not None:
+
+                # Load cursor
+                self.load()
+
+                # Cursor within database range
+                if (self.cursor is not None and
+                    start <= self.cursor["Page"] <= end):
+
+                    # Start reading from cursor
+                    start = self.cursor["Page"]
+
+                # Otherwise (e.g. database was reset)
+                else:
+
+                    # Ignore cursor
+                    self.cursor = None
+
             # Link to read database command
             command = self.commands["ReadDatabase"]
 
             # Tell command which database to read from
             command.database = self.code
 
-            # Read database
-            for i in range(start, end + 1):
-
-                # Give user info
-                Logger.debug("Reading database page " + str(i) + "/" +
-                             str(end) + "...")
+            # Read database (multiple pages per command)
+            for i in range(start, end + 1, self.batch):
 
-                # Tell command which page to read
+                # Tell command which page to start reading from
                 command.page = i
 
-                # Read page
+                # Tell command how many pages to read
+                command.n = min(self.batch, end + 1 - i)
+
+                # Give user info
+                Logger.debug("Reading database page(s) " + str(i) + "-" +
+                             str(i + command.n - 1) + "/" + str(end) + "...")
+
+                # Read pages
                 command.execute()
 
-                # Parse page
-                self.parse(command.response["Payload"])
+                # Compute expected payload size
+                size = command.n * self.pageSize
+
+                # Make sure all pages were received before cutting them
+                if len(command.response["Payload"]) != size:
+
+                    # Error
+                    raise errors.BadCGMPayload(size,
+                                               len(command.response["Payload"]))
+
+                # Go through pages
+                for j in range(command.n):
+
+                    # Parse page
+                    self.parse(command.response["Payload"]
+                               [j * self.pageSize:(j + 1) * self.pageSize])
 
-                # Verify page
-                self.verify()
+                    # Verify page
+                    self.verify()
 
             # Extract defined records from data
             if self.record is not None:
 
+                # Get system time of last synced record
+                if self.cursor is not None:
+
+                    # Get it
+                    t = self.cursor["System"]
+
+                # Otherwise
+                else:
+
+                    # Decode all records
+                    t = None
+
                 # Find them
-                self.record.find(self.data)
+                self.record.find(self.data, t)
+
+                # New records found
+                if self.record.system:
+
+                    # Update system time of last record
+                    t = max(self.record.system)
+
+                # Update cursor
+                if t is not None:
+
+                    # Point it to last page read and last record found
+                    self.cursor = {"Page": end, "System": t}
+
+                    # Store it
+                    self.store()
 
 
 
@@ -54,12 +54,14 @@ class Packet(object):
 
 
 
-    def build(self, code, database, page):
+    def build(self, code, database, page, n = 1):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             BUILD
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Build packet. If a page is given, n consecutive pages are requested
+            starting from it.
         """
 
         # Reset packet
@@ -76,7 +78,7 @@ class Packet(object):
         if page is not None:
             page = lib.pack(page, "<") + [0] * 4
             page = page[:4]
-            page.append(1)
+            page.append(n)
 
         else:
             page = []
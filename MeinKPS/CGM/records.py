@@ -24,12 +24,14 @@
 
 # LIBRARIES
 import datetime
+import numpy as np
 
 
 
 # USER LIBRARIES
 import lib
 import logger
+import errors
 import reporter
 
 
@@ -56,51 +58,97 @@ class Record(object):
         # Initialize record size
         self.size = None
 
+        # Initialize record layout
+        self.layout = None
+
         # Initialize record vectors
         self.t = None
+        self.system = None
         self.values = None
         self.bytes = None
 
+        # Initialize records
+        self.records = None
+
         # Link with CGM
         self.cgm = cgm
 
 
 
-    def find(self, data):
+    def dtype(self):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            FIND
+            DTYPE
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return structured data type corresponding to record layout. If
+            record layout is undefined, only decode its times and CRC.
         """
 
-        # Reset record vectors
-        self.t = []
-        self.values = []
-        self.bytes = []
+        # Get layout
+        layout = self.layout
+
+        # No layout defined
+        if layout is None:
+
+            # Define generic one
+            layout = [("Data", "u1", (self.size - 10,))]
+
+        # Add system/display times and CRC to layout
+        return np.dtype([("System", "<u4"), ("Display", "<u4")] + layout +
+                        [("CRC", "<u2")])
+
+
+
+    def find(self, data, after = None):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            FIND
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Map data onto an array of records, and verify/decode them as a
+            whole. If a system time is given (s since CGM epoch), only records
+            more recent than it are considered. System time, unlike display
+            time, does not jump back when user changes receiver's clock.
+        """
 
         # Compute number of records in data
         n = len(data) / self.size
 
-        # Extract records
-        for i in range(n):
+        # Map data onto records
+        self.bytes = np.array(data[:n * self.size], np.uint8).reshape(n,
+                                                                  self.size)
+        self.records = self.bytes.reshape(-1).view(self.dtype())
 
-            # Extract ith record's bytes
-            bytes = data[i * self.size: (i + 1) * self.size]
+        # Decode local times
+        t = (np.datetime64(self.cgm.clock.epoch, "s") +
+             self.records["Display"].astype("timedelta64[s]"))
 
-            # Give user info
-            Logger.debug("Record bytes: " + str(bytes))
+        # If system time given
+        if after is not None:
+
+            # Only keep records more recent than it
+            indices = self.records["System"] > after
 
-            # Store them
-            self.bytes.append(bytes)
+            # Filter records
+            self.bytes = self.bytes[indices]
+            self.records = self.records[indices]
+            t = t[indices]
 
-            # Verify them
-            self.verify()
+        # Give user info
+        Logger.debug("Found " + str(len(self.records)) + " record(s).")
 
-            # Decode them
-            self.decode()
+        # Store times
+        self.t = t.tolist()
+        self.system = self.records["System"].tolist()
 
-        # Store records
+        # Verify records
+        self.verify()
+
+        # Decode them
+        self.decode()
+
+        # Store them
         self.store()
 
 
@@ -113,15 +161,23 @@ class Record(object):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
-        # Decode and compute CRCs
-        expectedCRC = lib.unpack(self.bytes[-1][-2:], "<")
-        computedCRC = lib.computeCRC16(self.bytes[-1][:-2])
+        # Compute CRCs of all records
+        computedCRCs = lib.computeCRC16s(self.bytes[:, :-2])
+
+        # Get expected ones
+        expectedCRCs = self.records["CRC"]
+
+        # Find mismatches
+        indices = np.flatnonzero(computedCRCs != expectedCRCs)
 
         # Exit if CRCs mismatch
-        if computedCRC != expectedCRC:
+        if len(indices):
+
+            # Get first mismatch
+            i = indices[0]
 
             # Raise error
-            raise errors.BadCGMRecordCRC(expectedCRC, computedCRC)
+            raise errors.BadCGMRecordCRC(expectedCRCs[i], computedCRCs[i])
 
 
 
@@ -133,12 +189,7 @@ class Record(object):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
-        # Decode local time
-        t = (self.cgm.clock.epoch +
-             datetime.timedelta(seconds = lib.unpack(self.bytes[-1][4:8], "<")))
-
-        # Store it
-        self.t.append(t)
+        pass
 
 
 
@@ -185,6 +236,10 @@ class BGRecord(Record):
         # Define record size
         self.size = 13
 
+        # Define record layout (without times and CRC)
+        self.layout = [("BG", "<u2"),
+                       ("Trend", "u1")]
+
         # Define dictionary for trends
         self.trends = {1: "90UpUp",
                        2: "90Up",
@@ -220,40 +275,39 @@ class BGRecord(Record):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
-        # Initialize decoding
-        super(self.__class__, self).decode()
-
-        # Decode BG
-        BG = lib.unpack(self.bytes[-1][8:10], "<") & 1023
+        # Decode BGs
+        BGs = self.records["BG"] & 1023
 
-        # Decode trend
-        trend = self.trends[self.bytes[-1][10] & 15]
+        # Decode trends
+        trends = self.records["Trend"] & 15
 
-        # Deal with special values
-        if BG in self.special:
+        # Find normal (non-special) values
+        normal = np.logical_not(np.in1d(BGs, self.special.keys()))
 
-            # Decode special BG
-            BG = self.special[BG]
+        # Convert values to float
+        values = BGs.astype(float)
 
-            # Give user info
-            Logger.info("Special value: " + BG)
+        # Convert BG units if desired
+        if self.convert:
 
-        # Deal with normal values
-        else:
+            # Convert them
+            values = np.round(values / 18.0, 1)
 
-            # Convert BG units if desired
-            if self.convert:
+        # Store them
+        self.values = {"BG": values,
+                       "Raw": BGs,
+                       "Trend": trends,
+                       "Normal": normal}
 
-                # Convert them
-                BG = round(BG / 18.0, 1)
+        # If records decoded
+        if len(values):
 
             # Give user info
-            Logger.info("BG: " + str(BG) + " " + str(trend) + " " +
+            Logger.info("Decoded " + str(len(values)) + " BG(s). Last one: " +
+                        str(values[-1]) + " " +
+                        str(self.trends.get(trends[-1])) + " " +
                         "(" + lib.formatTime(self.t[-1]) + ")")
 
-        # Store them
-        self.values.append({"BG": BG, "Trend": trend})
-
 
 
     def filter(self):
@@ -264,29 +318,20 @@ class BGRecord(Record):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
-        # Initialize record dict
-        BGs = {}
-
-        # Compute number of decoded records
-        n = len(self.t)
-
-        # Filter records
-        for i in range(n):
+        # Print special values
+        for i in np.flatnonzero(np.logical_not(self.values["Normal"])):
 
-            # Only keep normal (numeric) BG values
-            if type(self.values[i]["BG"]) is float:
-
-                # Store them
-                BGs[self.t[i]] = self.values[i]["BG"]
-
-            # Print special values
-            else:
+            # Give user info
+            Logger.info("Special value: " +
+                        str(self.special[self.values["Raw"][i]]) + " (" +
+                        str(self.t[i]) + ")")
 
-                # Give user info
-                Logger.info(self.values[i]["BG"] + " (" + str(self.t[i]) + ")")
+        # Only keep normal (numeric) BG values
+        indices = np.flatnonzero(self.values["Normal"])
 
         # Return them
-        return BGs
+        return dict([(self.t[i], self.values["BG"][i].item())
+                     for i in indices])
 
 
 
@@ -325,6 +370,10 @@ class SensorRecord(Record):
         # Define record size
         self.size = 15
 
+        # Define record layout (without times and CRC)
+        self.layout = [("Unknown", "u1", (4,)),
+                       ("Status", "u1")]
+
         # Define possible sensor status
         self.statuses = {1: "Stopped",
                          2: "Expired",
@@ -346,18 +395,15 @@ class SensorRecord(Record):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
-        # Initialize decoding
-        super(self.__class__, self).decode()
-
-        # Decode sensor status
-        status = self.statuses[self.bytes[-1][12]]
-
-        # Store it
-        self.values.append(status)
+        # Decode sensor statuses
+        self.values = self.records["Status"]
 
         # Give user info
-        Logger.info("Sensor status: " + str(status) + " " +
-                    "(" + lib.formatTime(self.t[-1]) + ")")
+        for t, status in zip(self.t, self.values):
+
+            # Info
+            Logger.info("Sensor status: " + str(self.statuses[status]) + " " +
+                        "(" + lib.formatTime(t) + ")")
 
 
 
@@ -375,7 +421,8 @@ class SensorRecord(Record):
 
         # Add entries
         Reporter.add(self.report, ["CGM", "Sensor Statuses"],
-                     dict(zip(self.t, self.values)))
+                     dict(zip(self.t, [self.statuses[status]
+                                       for status in self.values])))
 
 
 
@@ -398,6 +445,10 @@ class CalibrationRecord(Record):
         # Define record size
         self.size = 16
 
+        # Define record layout (without times and CRC)
+        self.layout = [("BG", "<u2"),
+                       ("Unknown", "u1", (4,))]
+
 
 
     def decode(self):
@@ -408,18 +459,15 @@ class CalibrationRecord(Record):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
-        # Initialize decoding
-        super(self.__class__, self).decode()
-
-        # Decode BG
-        BG = round(lib.unpack(self.bytes[-1][8:10], "<") / 18.0, 1)
-
-        # Store it
-        self.values.append(BG)
+        # Decode BGs
+        self.values = np.round(self.records["BG"] / 18.0, 1)
 
         # Give user info
-        Logger.info("BG: " + str(BG) + " " + self.cgm.units.value + " " +
-                    "(" + lib.formatTime(self.t[-1]) + ")")
+        for t, BG in zip(self.t, self.values):
+
+            # Info
+            Logger.info("BG: " + str(BG) + " " + self.cgm.units.value + " " +
+                        "(" + lib.formatTime(t) + ")")
 
 
 
@@ -437,7 +485,7 @@ class CalibrationRecord(Record):
 
         # Add entries
         Reporter.add(self.report, ["CGM", "Calibrations"],
-                     dict(zip(self.t, self.values)))
+                     dict(zip(self.t, self.values.tolist())))
 
 
 
@@ -455,4 +503,4 @@ class EventRecord(Record):
         super(self.__class__, self).__init__(cgm)
 
         # Define record size
-        self.size = 20
\ No newline at end of file
+        self.size = 20
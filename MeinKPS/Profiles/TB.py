@@ -55,6 +55,22 @@ class TB(base.PastProfile):
 
 
 
+    def reset(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            RESET
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Reset profile components
+        super(TB, self).reset()
+
+        # Reset units
+        self.u = []
+
+
+
     def decouple(self):
 
         """
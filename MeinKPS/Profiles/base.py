@@ -25,6 +25,7 @@
 # LIBRARIES
 import numpy as np
 import copy
+import bisect
 import datetime
 
 
@@ -33,6 +34,7 @@ import datetime
 import lib
 import logger
 import errors
+import metrics
 import reporter
 
 
@@ -40,6 +42,7 @@ import reporter
 # Define instances
 Logger = logger.Logger("Profiles/base.py")
 Reporter = reporter.Reporter()
+Metrics = metrics.Metrics()
 
 
 
@@ -93,6 +96,9 @@ class Profile(object):
         # Initialize data
         self.data = {}
 
+        # Initialize data kept in memory for a whole period (see preload)
+        self.memory = None
+
         # Define whether data is time mapped or not
         self.mapped = True
 
@@ -128,6 +134,10 @@ class Profile(object):
         self.y = []
         self.dydt = []
 
+        # Reset step durations (otherwise they pile up when profile is built
+        # more than once)
+        self.d = []
+
         # Reset loaded data
         self.data = {}
 
@@ -144,6 +154,9 @@ class Profile(object):
         # Give user info
         Logger.debug("Building...")
 
+        # Start timer
+        t0 = Metrics.now()
+
         # Define time references
         self.time(start, end)
 
@@ -174,6 +187,9 @@ class Profile(object):
         # Show profile
         self.show()
 
+        # Update build timer
+        Metrics.time("Profile " + self.__class__.__name__, t0)
+
 
 
     def time(self, start, end):
@@ -253,6 +269,24 @@ class Profile(object):
                 # last entries)
                 dates = [end + datetime.timedelta(days = x) for x in dates]
 
+                # Dates covered by data kept in memory
+                if (self.memory is not None and
+                    self.memory["Dates"][0] <= dates[0] and
+                    dates[-1] <= self.memory["Dates"][-1]):
+
+                    # Pick data from it
+                    self.data = self.recall(dates[0], dates[-1])
+
+                    # Give user info
+                    Logger.debug("'" + self.__class__.__name__ + "' " +
+                                 "loaded from memory.")
+
+                    # Exit
+                    return
+
+                # Initialize data of each report
+                sections = []
+
                 # Get corresponding reports
                 for date in dates:
 
@@ -260,11 +294,8 @@ class Profile(object):
                     try:
 
                         # Get current data
-                        data = Reporter.get(self.report, self.branch, None,
-                                            date)
-
-                        # Load data
-                        self.data = lib.mergeNDicts(self.data, data)
+                        sections.append(Reporter.get(self.report, self.branch,
+                                                     None, date))
 
                     # Otherwise
                     except:
@@ -272,6 +303,12 @@ class Profile(object):
                         # Skip
                         pass
 
+                # If data found
+                if sections:
+
+                    # Load it (merged in one pass)
+                    self.data = lib.mergeNDicts(self.data, *sections)
+
             # If looking for last stored data
             else:
 
@@ -290,6 +327,72 @@ class Profile(object):
 
 
 
+    def preload(self, start, end):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            PRELOAD
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Load data of whole period once and keep it in memory, so that
+            profiles later built within it (e.g. every step of a replay) pick
+            theirs from it instead of reading reports again. Only profiles
+            strictly loaded from dated reports can do that.
+        """
+
+        # Forget data kept so far
+        self.memory = None
+
+        # Profile not loaded from dated reports
+        if not self.mapped or not self.strict:
+
+            # Exit
+            return
+
+        # Define time references of period
+        self.time(start, end)
+
+        # Load its data
+        self.load()
+
+        # Sort its keys
+        keys = sorted(self.data)
+
+        # Keep data in memory, along with dates covered and times of keys
+        self.memory = {"Dates": [start.date() - datetime.timedelta(days = 1),
+                                 end.date()],
+                       "T": [lib.formatTime(key) for key in keys],
+                       "Keys": keys,
+                       "Data": self.data}
+
+        # Reset loaded data
+        self.reset()
+
+
+
+    def recall(self, a, b):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            RECALL
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return data kept in memory between given dates (both included).
+        """
+
+        # Get limit times
+        a = datetime.datetime.combine(a, datetime.time())
+        b = datetime.datetime.combine(b + datetime.timedelta(days = 1),
+                                      datetime.time())
+
+        # Find corresponding keys (times are sorted)
+        i = bisect.bisect_left(self.memory["T"], a)
+        j = bisect.bisect_left(self.memory["T"], b)
+
+        # Return data
+        return dict((key, self.memory["Data"][key])
+                    for key in self.memory["Keys"][i:j])
+
+
+
     def decouple(self):
 
         """
@@ -747,6 +850,12 @@ class Profile(object):
             Show profile components.
         """
 
+        # Components would not be logged (e.g. during replay)
+        if not Logger.allows("DEBUG"):
+
+            # Skip formatting them
+            return
+
         # Define profile dictionary
         profile = {"Standard t-axis": [self.T, self.y],
                    "Normalized t-axis": [self.t, self.y],
@@ -916,8 +1025,13 @@ class Profile(object):
         # Verify validity of operation
         self.validate(operands)
 
-        # Copy profile on which operation is done
-        new = copy.deepcopy(self)
+        # Copy profile on which operation is done (without its components and
+        # loaded data, which are reset anyway and slow to copy, and sharing
+        # data kept in memory, which is only read)
+        memo = dict((id(x), type(x)()) for x in [self.T, self.t, self.y,
+                                                 self.dydt, self.d, self.data])
+        memo[id(self.memory)] = self.memory
+        new = copy.deepcopy(self, memo)
 
         # Reset its components
         new.reset()
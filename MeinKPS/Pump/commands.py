@@ -33,6 +33,7 @@ import datetime
 import lib
 import logger
 import errors
+import metrics
 import reporter
 import packets
 
@@ -41,6 +42,7 @@ import packets
 # Define instances
 Logger = logger.Logger("Pump/commands.py")
 Reporter = reporter.Reporter()
+Metrics = metrics.Metrics()
 
 
 
@@ -166,12 +168,18 @@ class Command(object):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
+        # Start timer
+        t0 = Metrics.now()
+
         # Send command
         self.send()
 
         # Receive response
         self.receive()
 
+        # Update radio exchange timer
+        Metrics.time("Pump Radio", t0)
+
 
 
     def decode(self):
@@ -210,6 +218,9 @@ class Command(object):
             (if any) is decoded, and returned.
         """
 
+        # Start timer
+        t0 = Metrics.now()
+
         # Reset command
         self.reset()
 
@@ -225,6 +236,9 @@ class Command(object):
         # Store response
         self.store()
 
+        # Update command timer
+        Metrics.time("Pump " + self.__class__.__name__, t0)
+
         # Return it
         return self.response
 
@@ -467,6 +481,9 @@ class BigCommand(Command):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
+        # Start timer
+        t0 = Metrics.now()
+
         # Reset command
         self.reset()
 
@@ -488,6 +505,9 @@ class BigCommand(Command):
         # Store response
         self.store()
 
+        # Update command timer
+        Metrics.time("Pump " + self.__class__.__name__, t0)
+
         # Return response
         return self.response
 
@@ -34,6 +34,7 @@
 
 # LIBRARIES
 import datetime
+import time
 
 
 
@@ -123,6 +124,9 @@ class Pump(object):
         # Give the pump a history instance
         self.history = History(self)
 
+        # Give the pump a radio session
+        self.session = Session(self)
+
 
 
     def start(self):
@@ -154,6 +158,126 @@ class Pump(object):
 
 
 
+class Session(object):
+
+    def __init__(self, pump):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            INIT
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Store pump
+        self.pump = pump
+
+        # Initialize queued tasks
+        self.tasks = []
+
+        # Initialize task durations (s)
+        self.durations = {}
+
+        # Define default task duration (s), when it was never measured
+        self.default = 5
+
+        # Define report
+        self.report = "pump.json"
+
+
+
+    def add(self, name, task, *args):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            ADD
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Queue task
+        self.tasks.append([name, task, args])
+
+
+
+    def estimate(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            ESTIMATE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Estimate time (s) needed to run queued tasks, based on their last
+            measured durations.
+        """
+
+        # Try reading last durations
+        try:
+
+            # Get them
+            durations = Reporter.get(self.report, ["Session", "Durations"])
+
+        # Otherwise
+        except errors.NoSection:
+
+            # No durations
+            durations = {}
+
+        # Sum durations of queued tasks
+        return sum([durations.get(name, self.default)
+                    for [name, task, args] in self.tasks])
+
+
+
+    def run(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            RUN
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Run queued tasks back-to-back within a single RF session, which is
+            only renewed if it would not last long enough for all of them.
+        """
+
+        # No tasks queued
+        if not self.tasks:
+
+            # Exit
+            return
+
+        # Reset durations
+        self.durations = {}
+
+        # Make sure pump's radio transmitter stays on during all tasks
+        self.pump.power.verify(self.estimate())
+
+        # Try
+        try:
+
+            # Run tasks
+            for [name, task, args] in self.tasks:
+
+                # Get starting time
+                t0 = time.time()
+
+                # Run task
+                task(*args)
+
+                # Store its duration
+                self.durations[name] = round(time.time() - t0, 2)
+
+                # Info
+                Logger.debug(name + ": " + str(self.durations[name]) + " s")
+
+        # Always
+        finally:
+
+            # Empty queue
+            self.tasks = []
+
+            # Store durations
+            Reporter.add(self.report, ["Session", "Durations"],
+                         self.durations, True)
+
+
+
 class PumpComponent(object):
 
     def __init__(self, pump):
@@ -176,6 +300,12 @@ class PumpComponent(object):
         # Initialize value
         self.value = None
 
+        # Initialize cache time to live (h) of value (no caching by default)
+        self.TTL = None
+
+        # Initialize value freshness (read from pump or trusted from cache)
+        self.fresh = None
+
 
 
     def read(self):
@@ -194,6 +324,106 @@ class PumpComponent(object):
 
 
 
+    def age(self, *args):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            AGE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return time since value was last read from pump, or None if it
+            never was.
+        """
+
+        # Define cache key
+        key = " ".join([self.name] + list(args))
+
+        # Try reading last time value was read from pump
+        try:
+
+            # Get it
+            t = lib.formatTime(Reporter.get("pump.json", ["Cache"], key))
+
+        # Otherwise
+        except errors.NoSection:
+
+            # Not cached
+            t = None
+
+        # No time found
+        if t is None:
+
+            # Exit
+            return None
+
+        # Return age
+        return datetime.datetime.now() - t
+
+
+
+    def update(self, *args, **kwargs):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            UPDATE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Read value from pump only if cached one (stored in 'pump.json') has
+            expired: it was never read, it was read on another day (forced
+            daily refresh), or it is older than its TTL. Otherwise, trust the
+            stored one.
+        """
+
+        # Get current time
+        now = datetime.datetime.now()
+
+        # Get age of cached value
+        age = self.age(*args)
+
+        # Check if cached value expired
+        if (kwargs.get("force", False) or self.TTL is None or age is None or
+            (now - age).date() != now.date() or
+            age > datetime.timedelta(hours = self.TTL)):
+
+            # Read value from pump
+            self.read(*args)
+
+            # Update cache
+            Reporter.add("pump.json", ["Cache"],
+                         {" ".join([self.name] + list(args)):
+                          lib.formatTime(now)}, True)
+
+            # Value is fresh
+            self.fresh = True
+
+        # Otherwise
+        else:
+
+            # Info
+            Logger.info(" ".join([self.name] + list(args)) + ": cached (" +
+                        str(age.seconds / 60) + " m old)")
+
+            # Value is cached
+            self.fresh = False
+
+
+
+    def invalidate(self, *args):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            INVALIDATE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Force next update to read value from pump.
+        """
+
+        # Erase cache time
+        Reporter.add("pump.json", ["Cache"],
+                     {" ".join([self.name] + list(args)): None}, True)
+
+        # Value is not fresh anymore
+        self.fresh = False
+
+
+
     def show(self):
 
         """
@@ -223,6 +453,13 @@ class Power(PumpComponent):
         # Define default session length (m)
         self.session = 10
 
+        # Define time buffer (s) added to required session time in order to
+        # eliminate dead calls at the end of an RF session with the pump
+        self.buffer = 120
+
+        # Initialize end of current RF session
+        self.deadline = None
+
         # Instanciate corresponding command
         self.command = commands.Power(pump)
 
@@ -239,34 +476,59 @@ class Power(PumpComponent):
         # Read last time pump's radio transmitter was powered up
         self.value = lib.formatTime(Reporter.get("pump.json", [], "Power"))
 
+        # If pump was ever powered up
+        if self.value is not None:
 
+            # Compute end of RF session
+            self.deadline = (self.value +
+                             datetime.timedelta(minutes = self.session))
 
-    def verify(self):
+
+
+    def remaining(self):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            VERIFY
+            REMAINING
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return remaining time (s) in current RF session with the pump.
         """
 
-        # Read last power up time
-        self.read()
+        # If end of RF session unknown
+        if self.deadline is None:
 
-        # Get current time
-        now = datetime.datetime.now()
+            # Read last power up time
+            self.read()
 
-        # Compute time since last power up
-        delta = now - self.value
+        # No known RF session
+        if self.deadline is None:
 
-        # Generate a datetime object for the pump's RF sessions' length
-        session = datetime.timedelta(minutes = self.session)
+            # Exit
+            return 0
 
-        # Time buffer added to delta in order to eliminate dead calls at the end
-        # of an RF session with the pump
-        delta += datetime.timedelta(minutes = 2)
+        # Compute remaining time
+        t = (self.deadline - datetime.datetime.now()).total_seconds()
+
+        # Return it
+        return max(t, 0)
+
+
+
+    def verify(self, t = 0):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            VERIFY
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Power up pump's radio transmitter, unless current RF session lasts
+            long enough to fit given time (s).
+        """
+
+        # Get remaining time in current RF session
+        remaining = self.remaining()
 
         # Power up pump if necessary
-        if delta > session:
+        if remaining < t + self.buffer:
 
             # Info
             Logger.info("Pump's radio transmitter will be turned on...")
@@ -274,12 +536,15 @@ class Power(PumpComponent):
             # Power up pump's RF transmitter
             self.command.run(self.session)
 
+            # Update end of RF session
+            self.deadline = (datetime.datetime.now() +
+                             datetime.timedelta(minutes = self.session))
+
         else:
 
             # Info
             Logger.info("Pump's radio transmitter is already on. " +
-                        "Remaining time: " +
-                        str(self.session - delta.seconds / 60) + " m")
+                        "Remaining time: " + str(int(remaining) / 60) + " m")
 
 
 
@@ -678,6 +943,9 @@ class BGTargets(PumpComponent):
         # Define command
         self.command = commands.ReadBGTargets(pump)
 
+        # Define cache time to live (h)
+        self.TTL = 6
+
 
 
     def show(self):
@@ -720,6 +988,9 @@ class ISF(PumpComponent):
         # Define command
         self.command = commands.ReadISF(pump)
 
+        # Define cache time to live (h)
+        self.TTL = 6
+
 
 
     def show(self):
@@ -762,6 +1033,9 @@ class CSF(PumpComponent):
         # Define command
         self.command = commands.ReadCSF(pump)
 
+        # Define cache time to live (h)
+        self.TTL = 6
+
 
 
     def show(self):
@@ -829,6 +1103,9 @@ class Basal(PumpComponent):
         self.stroke = 0.025 # Pump basal stroke rate (U/h)
         self.time   = 30    # Time block (m) used by pump for basal durations
 
+        # Define cache time to live (h)
+        self.TTL = 6
+
 
 
     def read(self, profile):
@@ -1323,11 +1600,15 @@ class History(PumpComponent):
         # Initialize pages
         pages = self.pages
 
-        # Go through records
-        for record in self.records:
+        # Write all records together
+        with Reporter.batch():
+
+            # Go through records
+            for record in self.records:
 
-            # Find record within pages, decode it, and store remaining data
-            pages = record.find(pages)
+                # Find record within pages, decode it, and store remaining
+                # data
+                pages = record.find(pages)
 
 
 
@@ -27,11 +27,13 @@
 # USER LIBRARIES
 import lib
 import logger
+import metrics
 
 
 
-# Instanciate logger
+# Define instances
 Logger = logger.Logger("Stick/commands.py")
+Metrics = metrics.Metrics()
 
 
 
@@ -55,6 +57,9 @@ class Command(object):
         # Define report
         self.report = "stick.json"
 
+        # Initialize frame buffer
+        self.buffer = bytearray(64)
+
         # Initialize resettable command characteristics
         self.reset()
 
@@ -90,16 +95,59 @@ class Command(object):
 
 
 
+    def frame(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            FRAME
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return fields making up command frame to send to stick.
+        """
+
+        # Return command code
+        return [self.code]
+
+
+
     def send(self):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             SEND
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Assemble whole command frame in preallocated buffer and send it to
+            stick in a single USB transfer.
         """
 
-        # Send command code
-        self.stick.write(self.code)
+        # Initialize frame length
+        n = 0
+
+        # Go through fields
+        for field in self.frame():
+
+            # List
+            if type(field) is not list:
+
+                # Convert to list
+                field = [field]
+
+            # Compute new frame length
+            m = n + len(field)
+
+            # Grow buffer if frame does not fit
+            if m > len(self.buffer):
+
+                # Double its size
+                self.buffer.extend(bytearray(max(m, len(self.buffer))))
+
+            # Copy field to buffer
+            self.buffer[n:m] = bytearray(field)
+
+            # Update frame length
+            n = m
+
+        # Send frame
+        self.stick.write(self.buffer[:n])
 
 
 
@@ -168,6 +216,9 @@ class Command(object):
             (if any) is decoded, and returned.
         """
 
+        # Start timer
+        t0 = Metrics.now()
+
         # Reset command
         self.reset()
 
@@ -183,6 +234,9 @@ class Command(object):
         # Store response
         self.store()
 
+        # Update command timer
+        Metrics.time("Stick " + self.__class__.__name__, t0)
+
         # Return it
         return self.response
 
@@ -309,19 +363,16 @@ class ReadRadioRegister(Command):
 
 
 
-    def send(self):
+    def frame(self):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            SEND
+            FRAME
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
-        # Send command code
-        self.stick.write(self.code)
-
-        # Send register address
-        self.stick.write(self.address)
+        # Return command code and register address
+        return [self.code, self.address]
 
 
 
@@ -400,22 +451,16 @@ class WriteRadioRegister(Command):
 
 
 
-    def send(self):
+    def frame(self):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            SEND
+            FRAME
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
-        # Send command code
-        self.stick.write(self.code)
-
-        # Send register address
-        self.stick.write(self.address)
-
-        # Send value
-        self.stick.write(self.value)
+        # Return command code, register address and value
+        return [self.code, self.address, self.value]
 
 
 
@@ -486,22 +531,16 @@ class ReadRadio(Command):
 
 
 
-    def send(self):
+    def frame(self):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            SEND
+            FRAME
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
-        # Send command code
-        self.stick.write(self.code)
-
-        # Send channel
-        self.stick.write(self.channel)
-
-        # Send radio timeout
-        self.stick.write(self.timeout["Radio"])
+        # Return command code, channel and radio timeout
+        return [self.code, self.channel, self.timeout["Radio"]]
 
 
 
@@ -581,28 +620,16 @@ class WriteRadio(Command):
 
 
 
-    def send(self):
+    def frame(self):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            SEND
+            FRAME
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
-        # Send command code
-        self.stick.write(self.code)
-
-        # Send channel
-        self.stick.write(self.channel)
-
-        # Send delay
-        self.stick.write(self.delay)
-
-        # Send data
-        self.stick.write(self.data["TX"])
-
-        # Send last byte
-        self.stick.write(0)
+        # Return command code, channel, delay, data and last byte
+        return [self.code, self.channel, self.delay, self.data["TX"], 0]
 
 
 
@@ -696,40 +723,19 @@ class WriteReadRadio(Command):
 
 
 
-    def send(self):
+    def frame(self):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            SEND
+            FRAME
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
-        # Send command code
-        self.stick.write(self.code)
-
-        # Send write channel
-        self.stick.write(self.channel["TX"])
-
-        # Send repeat count
-        self.stick.write(self.repeat)
-
-        # Send send repeat delay
-        self.stick.write(self.delay)
-
-        # Send read channel
-        self.stick.write(self.channel["RX"])
-
-        # Send radio timeout
-        self.stick.write(self.timeout["Radio"])
-
-        # Send retry count
-        self.stick.write(self.retry)
-
-        # Send packet
-        self.stick.write(self.data["TX"])
-
-        # Send last byte
-        self.stick.write(0)
+        # Return command code, write channel, repeat count, send repeat delay,
+        # read channel, radio timeout, retry count, packet and last byte
+        return [self.code, self.channel["TX"], self.repeat, self.delay,
+                self.channel["RX"], self.timeout["Radio"], self.retry,
+                self.data["TX"], 0]
 
 
 
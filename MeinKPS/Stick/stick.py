@@ -29,6 +29,7 @@
 # LIBRARIES
 import usb
 import os
+import array
 import time
 import datetime
 import numpy as np
@@ -123,6 +124,10 @@ class Stick(object):
         # Define report
         self.report = "stick.json"
 
+        # Initialize receive buffers (reused across reads)
+        self.buffers = {"Chunk": array.array("B", [0] * 64),
+                        "RX": array.array("B", [0] * 1024)}
+
         # Initialize pump
         self.pump = pump
 
@@ -272,18 +277,25 @@ class Stick(object):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             WRITE
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            Write single byte to EP OUT. Tells the stick it is done writing when
-            not inputed a byte.
+            Write byte(s) to EP OUT. Tells the stick it is done writing when
+            not inputed a byte. Bytearrays (e.g. whole command frames) are
+            written as is, in a single transfer.
         """
 
-        # List
-        if type(bytes) is not list:
+        # Not already a bytearray
+        if type(bytes) is not bytearray:
+
+            # List
+            if type(bytes) is not list:
 
-            # Convert to list
-            bytes = [bytes]
+                # Convert to list
+                bytes = [bytes]
+
+            # Convert to bytearray
+            bytes = bytearray(bytes)
 
         # Write bytes to EP OUT
-        self.EPs["OUT"].write(bytearray(bytes))
+        self.EPs["OUT"].write(bytes)
 
 
 
@@ -294,35 +306,61 @@ class Stick(object):
             READ
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             Read from EP IN until it says it is done transmitting data using a
-            zero byte. Timeout must be given in ms.
+            zero byte. Timeout must be given in ms. Chunks are read directly
+            into a preallocated buffer and copied into the reusable receive
+            buffer, which is only converted once all bytes were received.
         """
 
-        # Initialize bytes
-        bytes = []
+        # Get chunk buffer
+        chunk = self.buffers["Chunk"]
+
+        # If its size does not match the one of chunks to read
+        if len(chunk) != n:
+
+            # Reallocate it
+            chunk = self.buffers["Chunk"] = array.array("B", [0] * n)
+
+        # Get receive buffer
+        buffer = self.buffers["RX"]
+
+        # Initialize number of bytes received
+        size = 0
 
         # Read bytes
         while True:
 
-            # Read, decode, and append new bytes
-            bytes += self.EPs["IN"].read(n, timeout = timeout)
+            # Read new bytes into chunk buffer
+            k = self.EPs["IN"].read(chunk, timeout = timeout)
 
-            # Exit condition
-            if bytes[-1] == 0:
+            # Grow receive buffer if new bytes do not fit
+            if size + k > len(buffer):
+
+                # Double its size
+                buffer.extend(array.array("B", [0] * max(k, len(buffer))))
+
+            # Copy new bytes into receive buffer
+            buffer[size:size + k] = chunk[:k]
+
+            # Update number of bytes received
+            size += k
+
+            # Exit condition (only last byte of new chunk needs to be checked)
+            if k and chunk[k - 1] == 0:
 
                 # Remove end byte
-                bytes.pop(-1)
+                size -= 1
 
                 # Exit
                 break
 
         # If bytes coming from radio are an error code
-        if radio and len(bytes) == 1 and bytes[-1] in self.errors:
+        if radio and size == 1 and buffer[0] in self.errors:
 
             # Raise error
-            raise errors.RadioError(self.errors[bytes[-1]])
+            raise errors.RadioError(self.errors[buffer[0]])
 
         # Return them
-        return bytes
+        return buffer[:size].tolist()
 
 
 
@@ -410,7 +448,7 @@ class Stick(object):
 
 
 
-    def optimize(self, RSSIs):
+    def optimize(self, RSSIs, threshold = 5):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -429,8 +467,8 @@ class Stick(object):
         x = x[indices]
         y = y[indices]
 
-        # Get frequency with max signal power (5 dBm threshold, 3 digits)
-        f = round(lib.getMaxMiddle(x, y, 5), 3)
+        # Get frequency with max signal power (dBm threshold, 3 digits)
+        f = round(lib.getMaxMiddle(x, y, threshold), 3)
 
         # Info
         Logger.info("Optimized frequency (MHz): " + str(f))
@@ -461,7 +499,49 @@ class Stick(object):
 
 
 
-    def scan(self, pump, F1 = None, F2 = None, n = 25, sample = 5):
+    def sample(self, pump, f, n = 5):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            SAMPLE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return sample average RSSI at given frequency.
+        """
+
+        # Initialize RSSI readings
+        RSSIs = []
+
+        # Tune frequency
+        self.tune(f)
+
+        # Sample
+        for i in range(n):
+
+            # Try
+            try:
+
+                # Run pump command
+                pump.model.read()
+
+                # Get last packet
+                pkt = pump.model.command.packets["RX"][-1]
+
+                # Get RSSI reading and add it
+                RSSIs.append(pkt.RSSI["dBm"])
+
+            # On invalid packet or radio error
+            except (errors.RadioError, errors.InvalidPumpPacket):
+
+                # Add fake low RSSI reading
+                RSSIs.append(-99)
+
+        # Average readings
+        return np.mean(RSSIs)
+
+
+
+    def scan(self, pump, F1 = None, F2 = None, n = 25, sample = 5,
+                   seed = None, step = 4, threshold = 5):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -469,55 +549,95 @@ class Stick(object):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             Scan the air for frequency with best signal strength (best sample
             average RSSI) to tune radio in order to communicate with pump.
+
+            Instead of sampling the whole frequency range, the search starts
+            from the given seed (e.g. last optimized frequency) or, if none,
+            from the best frequency of a coarse pass (every n-th frequency).
+            It then expands on both sides until RSSIs drop below the max
+            minus the optimizing threshold: assuming a single signal peak, all
+            frequencies used to optimize are then known, and the result is the
+            same as with a full scan.
         """
 
         # Test frequency range
         F1, F2 = self.localize(F1, F2)
 
+        # Define frequencies
+        F = [round(f, 3) for f in np.linspace(F1, F2, n, True)]
+
         # Initialize RSSI readings
         RSSIs = {}
 
-        # Go through frequency range
-        for f in np.linspace(F1, F2, n, True):
+        # Seed given and within frequency range
+        if seed is not None and F1 <= seed <= F2:
 
-            # Round frequency
-            f = round(f, 3)
+            # Start from closest frequency
+            i = np.argmin([abs(f - seed) for f in F])
 
-            # Initialize RSSI value
-            RSSIs[f] = []
+        # Otherwise
+        else:
 
-            # Tune frequency
-            self.tune(f)
+            # Coarse pass
+            for f in F[::step]:
 
-            # Sample
-            for i in range(sample):
+                # Sample
+                RSSIs[f] = self.sample(pump, f, sample)
 
-                # Try
-                try:
+            # Start from best frequency
+            i = F.index(max(RSSIs, key = RSSIs.get))
+
+        # Initialize window of contiguous sampled frequencies
+        a = b = i
+
+        # Expand window
+        while True:
 
-                    # Run pump command
-                    pump.model.read()
+            # Sample window limits if not done already
+            for f in [F[a], F[b]]:
 
-                    # Get last packet
-                    pkt = pump.model.command.packets["RX"][-1]
+                # Not sampled yet
+                if f not in RSSIs:
 
-                    # Get RSSI reading and add it
-                    RSSIs[f].append(pkt.RSSI["dBm"])
+                    # Sample
+                    RSSIs[f] = self.sample(pump, f, sample)
 
-                # On invalid packet or radio error
-                except (errors.RadioError, errors.InvalidPumpPacket):
+            # Get current max
+            RSSI = max(RSSIs.values())
 
-                    # Add fake low RSSI reading
-                    RSSIs[f].append(-99)
+            # Check if window limits are done
+            left = a == 0 or RSSIs[F[a]] < RSSI - threshold
+            right = b == n - 1 or RSSIs[F[b]] < RSSI - threshold
 
-            # Average readings
-            RSSIs[f] = np.mean(RSSIs[f])
+            # Peak bracketed
+            if left and right:
+
+                # Exit
+                break
+
+            # Expand left
+            if not left:
+
+                # Do it
+                a -= 1
+
+            # Expand right
+            if not right:
+
+                # Do it
+                b += 1
+
+        # Only keep contiguous window
+        RSSIs = dict([(f, RSSIs[f]) for f in F[a:b + 1]])
+
+        # Info
+        Logger.info("Sampled " + str(len(RSSIs)) + "/" + str(n) +
+                    " frequencies.")
 
         # Show readings
         Logger.debug(lib.JSONize(RSSIs))
 
         # Optimize frequency
-        f = self.optimize(RSSIs)
+        f = self.optimize(RSSIs, threshold)
 
         # Store it
         self.store(f)
@@ -551,12 +671,19 @@ class Stick(object):
             # Get current formatted time
             now = datetime.datetime.now()
 
-        # If no optimized frequency stored or stick not tuned today
-        if entry is None or now.day != t.day:
+        # If no optimized frequency stored
+        if entry is None:
 
             # Scan for best frequency and tune radio to it
             self.tune(self.scan(self.pump))
 
+        # If stick not tuned today
+        elif now.day != t.day:
+
+            # Scan for best frequency starting from last one and tune radio to
+            # it
+            self.tune(self.scan(self.pump, seed = f))
+
         # Otherwise
         else:
 
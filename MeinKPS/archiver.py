@@ -0,0 +1,597 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Title:    archiver
+
+    Author:   David Leclerc
+
+    Version:  0.1
+
+    Date:     19.10.2026
+
+    License:  GNU General Public License, Version 3
+              (http://www.gnu.org/licenses/gpl.html)
+
+    Overview: Binary archives of closed months of dated reports. Each month of
+              a report (e.g. Reports/2017/04/BG.npz) holds its time series as
+              columns: wall-clock times (s since 1970, int64) and values
+              (int64 for integers, float32 for floats it represents exactly
+              to 7 digits, float64 otherwise). Everything else stays as
+              JSON, day by day.
+
+    Notes:    - Columns are stored uncompressed within the archive, so they can
+                be memory-mapped: scanning a month reads a single file, without
+                any parsing.
+              - Usage (compacts closed months): python archiver.py
+
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+
+# LIBRARIES
+import os
+import copy
+import json
+import struct
+import zipfile
+import datetime
+import numpy as np
+
+
+
+# USER LIBRARIES
+import lib
+import logger
+import metrics
+
+
+
+# Define instances
+Logger = logger.Logger("archiver.py")
+Metrics = metrics.Metrics()
+
+
+
+# Define archives already loaded (by filename)
+archives = {}
+
+
+
+# CONSTANTS
+EPOCH = datetime.datetime(1970, 1, 1)
+DATE = "%Y.%m.%d"
+
+
+
+# CLASSES
+class Archive(object):
+
+    def __init__(self, filename):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            INIT
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Define archive file
+        self.filename = filename
+
+        # Initialize modification time of loaded archive
+        self.mtime = None
+
+        # Initialize non-columnar data (by day)
+        self.days = {}
+
+        # Initialize columns: [branch, integer values, times, values]
+        self.columns = []
+
+
+
+    def isColumn(self, section):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            ISCOLUMN
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            A section can be stored as a column if it is a time series of
+            numbers.
+        """
+
+        # Not a non-empty dict
+        if type(section) is not dict or not section:
+
+            # Exit
+            return False
+
+        # Go through entries
+        for key, value in section.items():
+
+            # Value is not a number
+            if type(value) not in [int, float]:
+
+                # Exit
+                return False
+
+            # Key is not a time
+            if type(lib.formatTime(key)) is not datetime.datetime:
+
+                # Exit
+                return False
+
+        # Time series
+        return True
+
+
+
+    def split(self, report, branch = None, columns = None):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            SPLIT
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Split report into time series (by branch) and the rest of it.
+        """
+
+        # First level
+        if branch is None:
+
+            # Initialize branch and columns
+            branch = []
+            columns = {}
+
+        # Time series
+        if self.isColumn(report):
+
+            # Store it
+            columns[tuple(branch)] = report
+
+            # Nothing left
+            return [columns, None]
+
+        # Initialize rest of report
+        rest = {}
+
+        # Go through sections
+        for key, value in report.items():
+
+            # Section
+            if type(value) is dict and value:
+
+                # Split it
+                value = self.split(value, branch + [key], columns)[1]
+
+                # Fully stored as columns
+                if value is None:
+
+                    # Skip
+                    continue
+
+            # Keep rest
+            rest[key] = value
+
+        # Return columns and rest
+        return [columns, rest]
+
+
+
+    def load(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            LOAD
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            (Re)load archive if it changed since last time.
+        """
+
+        # Get modification time of archive
+        mtime = os.path.getmtime(self.filename)
+
+        # Already loaded
+        if mtime == self.mtime:
+
+            # Exit
+            return
+
+        # Start timer
+        t0 = Metrics.now()
+
+        # Read index
+        with np.load(self.filename) as f:
+
+            # Get non-columnar data
+            self.days = json.loads(f["days"].item())
+
+            # Get columns
+            branches = json.loads(f["columns"].item())
+
+        # Map columns
+        self.columns = [[branch, integer,
+                         self.map("t" + str(i)), self.map("v" + str(i))]
+                        for i, [branch, integer] in enumerate(branches)]
+
+        # Update modification time
+        self.mtime = mtime
+
+        # Update load timer
+        Metrics.time("Archive Load", t0)
+
+
+
+    def map(self, key):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            MAP
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Memory-map array stored (uncompressed) within archive.
+        """
+
+        # Find array within archive
+        with zipfile.ZipFile(self.filename) as z:
+
+            # Get its info
+            info = z.getinfo(key + ".npy")
+
+        # Open archive
+        with open(self.filename, "rb") as f:
+
+            # Skip local file header (30 bytes, then name and extra field)
+            f.seek(info.header_offset + 26)
+            n, m = struct.unpack("<HH", f.read(4))
+            f.seek(n + m, os.SEEK_CUR)
+
+            # Read array header
+            version = np.lib.format.read_magic(f)
+
+            # Version 1.0
+            if version == (1, 0):
+
+                # Read
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+
+            # Otherwise
+            else:
+
+                # Read
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+
+            # Array starts here
+            offset = f.tell()
+
+        # Map array
+        return np.memmap(self.filename, dtype, "r", offset, shape)
+
+
+
+    def dates(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            DATES
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Load archive
+        self.load()
+
+        # Return archived days
+        return sorted([datetime.datetime.strptime(d, DATE).date()
+                       for d in self.days])
+
+
+
+    def read(self, branch, start, end):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            READ
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return times (s since 1970) and values of time series within
+            [start, end), as views of mapped arrays.
+        """
+
+        # Load archive
+        self.load()
+
+        # Find column
+        for b, integer, t, v in self.columns:
+
+            # Found
+            if b == list(branch):
+
+                # Find period
+                [i, j] = np.searchsorted(t, [epoch(start), epoch(end)])
+
+                # Return it
+                return [t[i:j], v[i:j]]
+
+        # No such column
+        return [np.zeros(0, "<i8"), np.zeros(0, "<f4")]
+
+
+
+    def day(self, date):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            DAY
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Rebuild report of given day (None if not archived).
+        """
+
+        # Load archive
+        self.load()
+
+        # Format date
+        key = date.strftime(DATE)
+
+        # Not archived
+        if key not in self.days:
+
+            # Exit
+            return None
+
+        # Start with non-columnar data
+        report = copy.deepcopy(self.days[key])
+
+        # Define period
+        start = datetime.datetime.combine(date, datetime.time())
+        end = start + datetime.timedelta(days = 1)
+
+        # Add columns
+        for branch, integer, times, values in self.columns:
+
+            # Get day's data
+            [T, V] = self.read(branch, start, end)
+
+            # None
+            if len(T) == 0:
+
+                # Skip
+                continue
+
+            # Get section
+            section = report
+
+            # Go down branch
+            for b in branch:
+
+                # Make section if needed
+                section = section.setdefault(b, {})
+
+            # Single precision values (shortest representation of them)
+            single = V.dtype == np.float32
+
+            # Add entries
+            for t, v in zip(T.tolist(), V.tolist()):
+
+                # Integer
+                if integer:
+
+                    # Convert
+                    v = int(v)
+
+                # Single precision
+                elif single:
+
+                    # Convert
+                    v = float("%.7g" % v)
+
+                # Add entry
+                section[lib.formatTime(EPOCH +
+                                       datetime.timedelta(seconds = t))] = v
+
+        # Return report
+        return report
+
+
+
+    def pack(self, values):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            PACK
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return values as smallest array which holds them exactly: int64
+            for integers, float32 if all values come back unchanged from it
+            (as read by day), float64 otherwise.
+        """
+
+        # Integers
+        if all([type(v) is int for v in values]):
+
+            # Store as such
+            return np.array(values, "<i8")
+
+        # Try single precision
+        array = np.array(values, "<f4")
+
+        # Values come back unchanged
+        if all([float("%.7g" % x) == v
+                for x, v in zip(array.tolist(), values)]):
+
+            # Keep it
+            return array
+
+        # Otherwise, use double precision
+        return np.array(values, "<f8")
+
+
+
+    def write(self, days):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            WRITE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Archive reports of given days ({date: JSON}), on top of days
+            already archived.
+        """
+
+        # Start timer
+        t0 = Metrics.now()
+
+        # Initialize reports with already archived days
+        reports = {}
+
+        # Archive exists
+        if os.path.exists(self.filename):
+
+            # Rebuild its days
+            for date in self.dates():
+
+                # Rebuild
+                reports[date] = self.day(date)
+
+        # Add new days
+        reports.update(days)
+
+        # Initialize data
+        rest = {}
+        columns = {}
+
+        # Split reports
+        for date, report in reports.items():
+
+            # Split
+            [c, r] = self.split(report)
+
+            # Store rest of report
+            rest[date.strftime(DATE)] = r or {}
+
+            # Gather time series by branch
+            for branch, section in c.items():
+
+                # Gather
+                columns.setdefault(branch, {}).update(section)
+
+        # Initialize arrays and index
+        arrays = {}
+        index = []
+
+        # Build columns
+        for i, branch in enumerate(sorted(columns)):
+
+            # Get time series (sorted by time)
+            keys = sorted(columns[branch])
+            values = [columns[branch][k] for k in keys]
+
+            # Store branch and type of values
+            index.append([list(branch),
+                          all([type(v) is int for v in values])])
+
+            # Store times
+            arrays["t" + str(i)] = np.array([epoch(lib.formatTime(k))
+                                             for k in keys], "<i8")
+
+            # Store values (without any loss of precision)
+            arrays["v" + str(i)] = self.pack(values)
+
+        # Store index and rest
+        arrays["columns"] = np.array(json.dumps(index))
+        arrays["days"] = np.array(json.dumps(rest, sort_keys = True))
+
+        # Define temporary file (unique to process)
+        tmp = os.path.join(os.path.dirname(self.filename),
+                           "." + os.path.basename(self.filename) + "." +
+                           str(os.getpid()) + ".tmp")
+
+        # Write archive to it (uncompressed, so it can be mapped)
+        with open(tmp, "wb") as f:
+
+            # Write
+            np.savez(f, **arrays)
+
+        # Replace archive with it (atomic)
+        os.rename(tmp, self.filename)
+
+        # Update write timer
+        Metrics.time("Archive Store", t0)
+
+
+
+def epoch(t):
+
+    """
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        EPOCH
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        Convert wall-clock time to seconds since 1970 (no time zone, so
+        times are never shifted or merged around DST changes).
+    """
+
+    # Convert
+    return int((t - EPOCH).total_seconds())
+
+
+
+def get(filename):
+
+    """
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        GET
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        Return archive (kept loaded between calls), or None if it does not
+        exist.
+    """
+
+    # No archive
+    if not os.path.exists(filename):
+
+        # Exit
+        return None
+
+    # Not known yet
+    if filename not in archives:
+
+        # Instanciate it
+        archives[filename] = Archive(filename)
+
+    # Return it
+    return archives[filename]
+
+
+
+def same(a, b):
+
+    """
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        SAME
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        Compare reports exactly (archived values are stored without loss).
+    """
+
+    # Sections
+    if type(a) is dict and type(b) is dict:
+
+        # Compare them
+        return (sorted(a) == sorted(b) and
+                all([same(a[k], b[k]) for k in a]))
+
+    # Anything else
+    return a == b
+
+
+
+def main():
+
+    """
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        MAIN
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    """
+
+    # Import reporter (it uses archives itself)
+    import reporter
+
+    # Compact closed months of dated reports
+    reporter.Reporter().archive(datetime.datetime.now())
+
+
+
+# Run this when script is called from terminal
+if __name__ == "__main__":
+    main()
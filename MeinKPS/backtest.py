@@ -0,0 +1,489 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Title:    backtest
+
+    Author:   David Leclerc
+
+    Version:  0.1
+
+    Date:     19.10.2026
+
+    License:  GNU General Public License, Version 3
+              (http://www.gnu.org/licenses/gpl.html)
+
+    Overview: Replay calculator over recorded history, one step every 5
+              minutes, and compare the BGs it predicted with those that were
+              actually read.
+
+    Notes:    - Usage: python backtest.py START END (dates as YYYY.MM.DD, both
+                included)
+              - Reports are frozen during replay (see Reporter.snapshot): each
+                one is read once, then shared by all steps, and nothing is
+                written back to them.
+              - Profiles loaded from dated reports (TBs, boluses, IOBs, BGs)
+                keep the data of the whole period in memory (see
+                Profile.preload), and each step only picks its own from it.
+              - Results are stored in: Reports/Backtests/START_END.json
+
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+
+# LIBRARIES
+import sys
+import datetime
+import numpy as np
+
+
+
+# USER LIBRARIES
+import lib
+import path
+import logger
+import reporter
+import archiver
+import metrics
+import history
+import calculator
+
+
+
+# Define instances
+Logger = logger.Logger("backtest.py")
+Reporter = reporter.Reporter()
+Metrics = metrics.Metrics()
+History = history.History()
+
+
+
+# CONSTANTS
+DATE = "%Y.%m.%d"
+
+
+
+# CLASSES
+class Backtest(object):
+
+    def __init__(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            INIT
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Give backtest a calculator
+        self.calc = calculator.Calculator()
+
+        # Define time between steps
+        self.step = datetime.timedelta(minutes = 5)
+
+        # Define prediction horizons (m)
+        self.horizons = [30, 60]
+
+        # Define largest gap between predicted and actual BG times (s)
+        self.tolerance = 5 * 60
+
+        # Define how far back data is needed before first step (longer than
+        # any DIA)
+        self.margin = datetime.timedelta(days = 1)
+
+        # Define results directory
+        self.directory = path.Path(Reporter.src.str + "Backtests")
+
+        # Initialize results
+        self.reset()
+
+
+
+    def reset(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            RESET
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Reset replayed period
+        self.start = None
+        self.end = None
+
+        # Reset step times
+        self.T = []
+
+        # Reset recommended TBs
+        self.TBs = []
+
+        # Reset BGs at step times
+        self.BGs = []
+
+        # Reset predicted BGs (by horizon)
+        self.predictions = dict((h, []) for h in self.horizons)
+
+        # Reset number of failed steps
+        self.errors = 0
+
+
+
+    def run(self, start, end):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            RUN
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Replay calculator every step within [start, end).
+        """
+
+        # Reset previous results
+        self.reset()
+
+        # Store period
+        self.start = start
+        self.end = end
+
+        # Give user info
+        Logger.info("Replaying: " + lib.formatTime(start) + " - " +
+                                    lib.formatTime(end))
+
+        # Start timer
+        t0 = Metrics.now()
+
+        # Remember logging floor
+        floor = logger.floor
+
+        # Silence loggers (calculator logs a lot at every step, and failed
+        # steps are counted)
+        logger.floor = len(logger.LEVELS)
+
+        # Remember times parsed from strings during replay
+        lib.times = {}
+
+        # Try
+        try:
+
+            # Freeze reports (read once, never written)
+            with Reporter.snapshot():
+
+                # Load data of whole period once
+                self.preload(start - self.margin, end)
+
+                # Initialize step
+                t = start
+
+                # Go through steps
+                while t < end:
+
+                    # Run step
+                    self.iterate(t)
+
+                    # Next one
+                    t += self.step
+
+        # Always
+        finally:
+
+            # Forget data of period
+            self.preload(None, None)
+
+            # Forget parsed times
+            lib.times = None
+
+            # Restore logging floor
+            logger.floor = floor
+
+        # Update replay timer
+        Metrics.time("Backtest", t0)
+
+        # Give user info
+        Logger.info("Replayed " + str(len(self.T)) + " step(s) (" +
+                    str(self.errors) + " failed) in " +
+                    str(round(Metrics.now() - t0, 1)) + " s")
+
+
+
+    def preload(self, start, end):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            PRELOAD
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Keep data of given period in memory within calculator's profiles
+            loaded from dated reports (or forget it if no period is given).
+        """
+
+        # Go through profiles
+        for profile in [self.calc.TB, self.calc.bolus, self.calc.IOB.past,
+                        self.calc.BG.past]:
+
+            # No period
+            if start is None:
+
+                # Forget data
+                profile.memory = None
+
+            # Otherwise
+            else:
+
+                # Load data
+                profile.preload(start, end)
+
+
+
+    def iterate(self, t):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            ITERATE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Run calculator at given time, and record its recommendation, as
+            well as the BGs it predicted (None if it could not).
+        """
+
+        # Try
+        try:
+
+            # Run calculator
+            TB = self.calc.run(t)
+
+        # Steps without enough data fail (e.g. no recent BG)
+        except Exception as e:
+
+            # Log error
+            Logger.debug("Step failed (" + lib.formatTime(t) + "): " + str(e))
+
+            # Count it
+            self.errors += 1
+
+            # Exit
+            return
+
+        # Get BG predictions (h from now)
+        BG = self.calc.BG
+
+        # Record step
+        self.T.append(t)
+        self.TBs.append(TB)
+        self.BGs.append(BG.past.y[-1] if BG.past.y else None)
+
+        # Record predictions
+        for h in self.horizons:
+
+            # Horizon covered by predictions
+            if BG.t and BG.t[0] <= h / 60.0 <= BG.t[-1]:
+
+                # Interpolate them
+                self.predictions[h].append(
+                    float(np.interp(h / 60.0, BG.t, BG.y)))
+
+            # Otherwise
+            else:
+
+                # No prediction
+                self.predictions[h].append(None)
+
+
+
+    def actual(self, T):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            ACTUAL
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return BGs read closest to given times (NaN if none within
+            tolerance).
+        """
+
+        # Initialize results
+        y = np.full(len(T), np.nan)
+
+        # Nothing to look for
+        if not T:
+
+            # Exit
+            return y
+
+        # Read BGs around times
+        [t, BG] = History.BG(min(T) - self.step, max(T) + self.step)
+
+        # No BGs
+        if len(t) == 0:
+
+            # Exit
+            return y
+
+        # Convert times
+        T = np.array([archiver.epoch(x) for x in T])
+
+        # Find BGs right after times
+        j = np.clip(np.searchsorted(t, T), 1, len(t) - 1)
+
+        # Pick closest one (before or after)
+        j -= np.abs(t[j - 1] - T) < np.abs(t[j] - T)
+
+        # Keep those within tolerance
+        found = np.abs(t[j] - T) <= self.tolerance
+
+        # Store them
+        y[found] = BG[j[found]]
+
+        # Return them
+        return y
+
+
+
+    def assess(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            ASSESS
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Compare predictions with actual BGs, and summarize replay.
+        """
+
+        # Initialize summary
+        summary = {"Steps": len(self.T) + self.errors,
+                   "Errors": self.errors,
+                   "TBs": len([TB for TB in self.TBs if TB is not None]),
+                   "Predictions": {}}
+
+        # Initialize actual BGs (by horizon)
+        actual = {}
+
+        # Go through horizons
+        for h in self.horizons:
+
+            # Get actual BGs at predicted times
+            actual[h] = self.actual([t + datetime.timedelta(minutes = h)
+                                     for t in self.T])
+
+            # Get predictions
+            predicted = np.array([np.nan if y is None else y
+                                  for y in self.predictions[h]])
+
+            # Compute prediction errors (where both are known)
+            errors = predicted - actual[h]
+            errors = errors[~np.isnan(errors)]
+
+            # Initialize horizon summary
+            summary["Predictions"][str(h)] = {"N": len(errors)}
+
+            # No errors to summarize
+            if len(errors) == 0:
+                continue
+
+            # Summarize them
+            summary["Predictions"][str(h)].update({
+                "MAE": round(float(np.mean(np.abs(errors))), 2),
+                "RMSE": round(float(np.sqrt(np.mean(errors ** 2))), 2),
+                "Bias": round(float(np.mean(errors)), 2)})
+
+        # Initialize steps
+        steps = {}
+
+        # Go through them
+        for i, t in enumerate(self.T):
+
+            # Store step
+            steps[lib.formatTime(t)] = {
+                "TB": self.TBs[i],
+                "BG": self.BGs[i],
+                "Predicted": dict((str(h), self.round(self.predictions[h][i]))
+                                  for h in self.horizons),
+                "Actual": dict((str(h), self.round(actual[h][i]))
+                               for h in self.horizons)}
+
+        # Return summary and steps
+        return [summary, steps]
+
+
+
+    def round(self, x):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            ROUND
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Round BG for storage (None if unknown).
+        """
+
+        # Unknown BG
+        if x is None or np.isnan(x):
+
+            # Return None
+            return None
+
+        # Return rounded BG
+        return round(float(x), 1)
+
+
+
+    def store(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            STORE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Store results of last replay, and return their summary.
+        """
+
+        # Assess replay
+        [summary, steps] = self.assess()
+
+        # Define report name (after first and last replayed days)
+        name = (self.start.strftime(DATE) + "_" +
+                (self.end - self.step).strftime(DATE) + ".json")
+
+        # Make results directory
+        self.directory.touch()
+
+        # Generate report
+        report = reporter.Report(name, self.directory.str, None,
+                                 {"Settings": {"Step": self.step.seconds / 60,
+                                               "Horizons": self.horizons,
+                                               "DIA": self.calc.DIA},
+                                  "Summary": summary,
+                                  "Steps": steps})
+
+        # Store it
+        report.store()
+
+        # Give user info
+        Logger.info("Results stored in: " + self.directory.str + name)
+
+        # Return summary
+        return summary
+
+
+
+def main():
+
+    """
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        MAIN
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    """
+
+    # Read period (end day included)
+    [start, end] = [datetime.datetime.strptime(x, DATE) for x in sys.argv[1:3]]
+    end += datetime.timedelta(days = 1)
+
+    # Instanciate a backtest
+    backtest = Backtest()
+
+    # Replay period
+    backtest.run(start, end)
+
+    # Store results
+    summary = backtest.store()
+
+    # Give user info
+    print summary
+
+
+
+# Run this when script is called from terminal
+if __name__ == "__main__":
+    main()
@@ -25,8 +25,6 @@
 # LIBRARIES
 import datetime
 import numpy as np
-import matplotlib as mpl
-import matplotlib.pyplot as plt
 
 
 
@@ -34,6 +32,7 @@ import matplotlib.pyplot as plt
 import lib
 import logger
 import reporter
+import history
 from Profiles import *
 
 
@@ -41,6 +40,7 @@ from Profiles import *
 # Define instances
 Logger = logger.Logger("calculator.py")
 Reporter = reporter.Reporter()
+History = history.History()
 
 
 
@@ -398,9 +398,11 @@ class Calculator(object):
         Snooze enactment of high TBs for a while after eating.
         """
 
-        # Get last carbs
-        lastCarbs = Reporter.getRecent(self.now, "treatments.json",
-                                                 ["Carbs"], 1)
+        # Get carbs of today and yesterday (snooze is shorter than a day), but
+        # ignore later ones (e.g. when replaying history)
+        lastCarbs = [t for t in Reporter.getRecent(self.now, "treatments.json",
+                                                   ["Carbs"], 2, True)
+                     if lib.formatTime(t) <= self.now]
 
         # Destructure TB
         [rate, units, duration] = TB
@@ -489,11 +491,11 @@ class Calculator(object):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
-        # Get last 24 hours of BGs
-        BGs = Reporter.getRecent(self.now, "BG.json", [], 7, True)
+        # Get last week of BGs (mapped from history cache, no parsing)
+        [t, BGs] = History.BG(self.now - datetime.timedelta(days = 7), self.now)
 
-        # Show them
-        lib.JSONize(BGs)
+        # Give user info
+        Logger.debug("BGs over last week: " + str(len(BGs)))
 
         # Build BG profile for last 24 hours
         BGProfile = 0
@@ -508,6 +510,11 @@ class Calculator(object):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
+        # Load plotting libraries only when needed (they take seconds to
+        # import and are not needed by the loop)
+        import matplotlib as mpl
+        import matplotlib.pyplot as plt
+
         # Initialize plot
         mpl.rc("font", size = 10, family = "Ubuntu")
         fig = plt.figure(0, figsize = (10, 8))
@@ -0,0 +1,396 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Title:    daemon
+
+    Author:   David Leclerc
+
+    Version:  0.1
+
+    Date:     19.10.2026
+
+    License:  GNU General Public License, Version 3
+              (http://www.gnu.org/licenses/gpl.html)
+
+    Overview: Resident loop process. Devices, caches and profiles are kept
+              alive between loops, which are scheduled right after the CGM
+              is expected to have a new reading.
+
+    Notes:    ...
+
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+
+# LIBRARIES
+import datetime
+import time
+
+
+
+# USER LIBRARIES
+import lib
+import logger
+import reporter
+import metrics
+import loop
+
+
+
+# Define instances
+Logger = logger.Logger("daemon.py")
+Reporter = reporter.Reporter()
+Metrics = metrics.Metrics()
+
+
+
+# CLASSES
+class Daemon(object):
+
+    def __init__(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            INIT
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Give the daemon a loop
+        self.loop = loop.Loop()
+
+        # Define time between CGM readings
+        self.period = datetime.timedelta(minutes = 5)
+
+        # Define delay after expected reading before looping (lets receiver
+        # get it from transmitter)
+        self.delay = datetime.timedelta(seconds = 30)
+
+        # Define margin to keep before next loop
+        self.margin = datetime.timedelta(seconds = 30)
+
+        # Initialize devices' state
+        self.ready = False
+
+        # Initialize time of last BG looped on
+        self.BG = None
+
+        # Define report
+        self.report = "loop.json"
+
+
+
+    def last(self, now):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            LAST
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return time of last known BG reading (if any).
+        """
+
+        # Get most recent BGs
+        BGs = Reporter.getRecent(now, "BG.json", [], 1)
+
+        # No recent BG
+        if not BGs:
+
+            # Exit
+            return None
+
+        # Return time of last one
+        return lib.formatTime(max(BGs))
+
+
+
+    def next(self, now):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            NEXT
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Compute time of next loop, based on last BG reading. If no recent
+            BG is known (e.g. CGM out of range), try again after one period,
+            rather than looping against devices non-stop.
+        """
+
+        # Get time of last BG
+        t = self.last(now)
+
+        # No recent BG
+        if t is None:
+
+            # Loop after one period
+            return now + self.period
+
+        # Expect reading to be available after a delay
+        t += self.delay
+
+        # Find next expected reading
+        while t <= now:
+
+            # Move on to next one
+            t += self.period
+
+        # Return it
+        return t
+
+
+
+    def start(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            START
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Give user info
+        Logger.info("Starting devices...")
+
+        # Count errors so far
+        n = self.loop.errors
+
+        # Start CGM
+        self.loop.doTry(self.loop.startCGM)
+
+        # Start pump
+        self.loop.doTry(self.loop.startPump)
+
+        # Devices are ready if no error occured
+        self.ready = self.loop.errors == n
+
+
+
+    def iterate(self, t):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            ITERATE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Run one loop, which has to be done before the next one is due.
+            Non-critical tasks are skipped if that deadline is at risk.
+        """
+
+        # If devices not ready
+        if not self.ready:
+
+            # (Re)start them
+            self.start()
+
+        # Define deadline
+        self.loop.deadline = t + self.period - self.margin
+
+        # Count errors so far
+        n = self.loop.errors
+
+        # Loop (without restarting/stopping devices)
+        self.loop.run(True, False)
+
+        # If something went wrong, restart devices on next loop
+        if self.loop.errors != n:
+
+            # Info
+            Logger.warning("Errors occured during loop: restarting devices " +
+                           "on next one.")
+
+            # Reset devices' state
+            self.ready = False
+
+        # Assess loop
+        self.assess(t)
+
+
+
+    def assess(self, t):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            ASSESS
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Measure how long after the BG reading it used the loop was
+            triggered, or count it as wasted if it found no new BG.
+        """
+
+        # Get time of last BG
+        BG = self.last(datetime.datetime.now())
+
+        # Count loops
+        Reporter.count(self.report, ["Daemon"], "Loops")
+
+        # No new BG
+        if BG is None or BG == self.BG:
+
+            # Info
+            Logger.warning("No new BG found: loop wasted.")
+
+            # Count wasted loops
+            Reporter.count(self.report, ["Daemon"], "Wasted")
+
+        # Otherwise
+        else:
+
+            # Compute trigger latency (s)
+            latency = (t - BG).total_seconds()
+
+            # Info
+            Logger.info("Trigger latency: " + str(latency) + " s")
+
+            # Add it to loop's metrics (histogram of latencies)
+            Metrics.record("Trigger Latency", latency)
+
+            # Update loop's metrics record (stored when loop ended)
+            Reporter.add(self.loop.metrics, [],
+                         {self.loop.t0: Metrics.summarize()}, True)
+
+            # Keep running total (mean over loops which were not wasted)
+            Reporter.count(self.report, ["Daemon"], "Total Latency", latency)
+
+        # Update time of last BG looped on
+        self.BG = BG
+
+        # Write counters
+        Reporter.commit(self.report)
+
+
+
+    def run(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            RUN
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Loop forever
+        while True:
+
+            # Get current time
+            now = datetime.datetime.now()
+
+            # Compute time of next loop
+            t = self.next(now)
+
+            # Give user info
+            Logger.info("Next loop: " + lib.formatTime(t))
+
+            # Wait until then
+            time.sleep((t - now).total_seconds())
+
+            # Loop
+            self.iterate(t)
+
+
+
+class Watcher(Daemon):
+
+    def __init__(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            INIT
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Initialize daemon
+        super(Watcher, self).__init__()
+
+        # Define time between polls
+        self.interval = datetime.timedelta(seconds = 15)
+
+        # Initialize position of newest BG record in CGM
+        self.position = None
+
+
+
+    def poll(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            POLL
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Get position of newest BG record in CGM (only reads database range
+            and its last page).
+        """
+
+        # If devices not ready
+        if not self.ready:
+
+            # (Re)start them
+            self.start()
+
+        # Try
+        try:
+
+            # Get position of newest BG record
+            return self.loop.cgm.databases["BG"].head()
+
+        # Ignore errors, but restart devices next time
+        except Exception as e:
+
+            # Log error
+            Logger.error(e)
+
+            # Reset devices' state
+            self.ready = False
+
+
+
+    def run(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            RUN
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Loop as soon as CGM has a new BG record.
+        """
+
+        # Loop forever
+        while True:
+
+            # Get current time
+            now = datetime.datetime.now()
+
+            # Poll CGM
+            position = self.poll()
+
+            # If BG database advanced
+            if position is not None and position != self.position:
+
+                # Give user info
+                Logger.info("New BG record(s) found: " + str(position))
+
+                # Update position
+                self.position = position
+
+                # Loop
+                self.iterate(now)
+
+            # Otherwise
+            else:
+
+                # Wait before polling again
+                time.sleep(self.interval.total_seconds())
+
+
+
+def main():
+
+    """
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        MAIN
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    """
+
+    # Instanciate a daemon (triggered by new CGM readings)
+    daemon = Watcher()
+
+    # Run it
+    daemon.run()
+
+
+
+# Run this when script is called from terminal
+if __name__ == "__main__":
+    main()
@@ -568,6 +568,22 @@ class BadCGMRecordCRC(CGMError):
 
 
 
+class BadCGMPayload(CGMError):
+
+    def prepare(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            PREPARE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Define error info
+        self.info = ("Expected payload size: " + self.args[0] + " B. " +
+                     "Received: " + self.args[1] + " B")
+
+
+
 # Reporter errors
 class BadPath(ReporterError):
 
@@ -624,6 +640,23 @@ class NoSection(ReporterError):
 
 
 
+class BadArchive(ReporterError):
+
+    def prepare(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            PREPARE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Define error info
+        self.info = ("Archived version of report '" + self.args[0] + "' (" +
+                     str(self.args[1]) + ") does not match it. Report was " +
+                     "kept.")
+
+
+
 # Calculator errors
 class BadDIA(ProfileError):
 
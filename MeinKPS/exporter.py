@@ -23,13 +23,18 @@
 """
 
 # LIBRARIES
+import os
+import json
+import hashlib
 import datetime
 
 
 
 # USER LIBRARIES
 import lib
+import path
 import logger
+import errors
 import reporter
 from Profiles import *
 
@@ -64,9 +69,35 @@ class Exporter(object):
                         "treatments": reporter.Report("treatments.json"),
                         "pump": reporter.Report("pump.json")}
 
+        # Define source reports (name, branch, dated) of each exported one
+        self.sources = {"BG": [["BG.json", [], True]],
+                        "history": [["history.json", [], True]],
+                        "treatments": [["treatments.json", [], True],
+                                       ["pump.json",
+                                        ["Basal Profile (Standard)"], False]],
+                        "pump": [["pump.json", [], False]]}
+
+        # Define exported reports built over a time window ending now (e.g.
+        # net basals), which then change even if their sources do not
+        self.windowed = ["treatments"]
+
+        # Initialize source file stats and hashes (by path and branch)
+        self.stats = {}
+        self.hashes = {}
+
+        # Define report of versions of sources used for last export (kept
+        # between runs)
+        self.report = "export.json"
+
+        # Initialize versions of sources used for last export
+        self.versions = None
+
         # Initialize net profile
         self.net = net.Net()
 
+        # Initialize recent net basals
+        self.basals = None
+
         # Initialize recent BGs
         self.BGs = None
 
@@ -90,44 +121,217 @@ class Exporter(object):
 
 
 
-    def get(self):
+    def load(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            LOAD
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Try
+        try:
+
+            # Load versions of sources used for last export
+            self.versions = Reporter.get(self.report, ["Versions"])
+
+        # Nothing exported yet
+        except (errors.NoReport, errors.NoSection):
+
+            # No versions
+            self.versions = {}
+
+
+
+    def hash(self, filename, branch):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            HASH
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return hash of report section. Report is only read (and section
+            hashed) again if its file changed since last time.
+        """
+
+        # Get file stats
+        stats = os.stat(filename)
+        stats = [stats.st_mtime, stats.st_size]
+
+        # Define hash key
+        key = (filename, tuple(branch))
+
+        # File unchanged
+        if self.stats.get(key) == stats:
+
+            # Return last hash
+            return self.hashes[key]
+
+        # Read report
+        with open(filename, "r") as f:
+
+            # Load JSON
+            section = json.load(f)
+
+        # Get section
+        for b in branch:
+
+            # Go down
+            section = section.get(b, {})
+
+        # Store stats
+        self.stats[key] = stats
+
+        # Compute and store section hash
+        self.hashes[key] = hashlib.md5(json.dumps(section,
+                                                  sort_keys = True)).hexdigest()
+
+        # Return it
+        return self.hashes[key]
+
+
+
+    def version(self, export):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            VERSION
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return version of sources of exported report (hashes of recent
+            source reports), along with time window it is built over, if any.
+        """
+
+        # Initialize version
+        version = []
+
+        # Loop on sources
+        for name, branch, dated in self.sources[export]:
+
+            # Dated report
+            if dated:
+
+                # Get dates of 2 most recent ones (like recent data)
+                dates = sorted([d for d in Reporter.getDates(name)
+                                if d <= self.now.date()])[-2:]
+
+            # Otherwise
+            else:
+
+                # Only one file
+                dates = [None]
+
+            # Go through files
+            for date in dates:
+
+                # Dated file
+                if date is not None:
+
+                    # Get it
+                    filename = (path.Path(Reporter.src.str +
+                                          path.formatDate(date)).str + name)
+
+                # Otherwise
+                else:
+
+                    # Get it
+                    filename = Reporter.src.str + name
+
+                # Day only found in its month's archive
+                if date is not None and not os.path.exists(filename):
+
+                    # Get archive
+                    archive = Reporter.getArchive(name, date)
+
+                    # Archive found
+                    if archive is not None:
+
+                        # Get its stats (it only changes when compacted
+                        # again)
+                        stats = os.stat(archive.filename)
+
+                        # Add them to version
+                        version.append([archive.filename,
+                                        [stats.st_mtime, stats.st_size]])
+
+                # Otherwise
+                else:
+
+                    # Add hash of file to version
+                    version.append([filename, self.hash(filename, branch)])
+
+        # Report built over a time window
+        if export in self.windowed:
+
+            # Add window to version
+            version.append([lib.formatTime(self.past),
+                            lib.formatTime(self.now)])
+
+        # Return version
+        return version
+
+
+
+    def get(self, exports):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             GET
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Only read data needed by reports to export.
         """
 
         # Info
         Logger.debug("Reading recent data...")
 
-        # Get recent BGs
-        self.BGs = Reporter.getRecent(self.now, "BG.json", [])
+        # BGs
+        if "BG" in exports:
 
-        # Get recent boluses
-        self.boluses = Reporter.getRecent(self.now, "treatments.json",
-                                          ["Boluses"])
+            # Get recent BGs
+            self.BGs = Reporter.getRecent(self.now, "BG.json", [])
 
-        # Get recent IOBs
-        self.IOBs = Reporter.getRecent(self.now, "treatments.json", ["IOB"])
+        # Treatments
+        if "treatments" in exports:
 
-        # Get recent history
-        self.history = Reporter.getRecent(self.now, "history.json", [], 1)
+            # Build net profile for given time range
+            self.net.build(self.past, self.now, basal.Basal(),
+                                                TB.TB(),
+                                                suspend.Suspend(),
+                                                resume.Resume())
 
-        # Get recent sensor statuses
-        self.statuses = Reporter.getRecent(self.now, "history.json",
-                                           ["CGM", "Sensor Statuses"])
+            # Format net basals
+            self.basals = dict(zip([lib.formatTime(T) for T in self.net.T],
+                                   [round(y, 2) for y in self.net.y]))
 
-        # Get recent calibrations
-        self.calibrations = Reporter.getRecent(self.now, "history.json",
-                                               ["CGM", "Calibrations"])
+            # Get recent boluses
+            self.boluses = Reporter.getRecent(self.now, "treatments.json",
+                                              ["Boluses"])
 
-        # Get pump data
-        self.pump = Reporter.get("pump.json", [])
+            # Get recent IOBs
+            self.IOBs = Reporter.getRecent(self.now, "treatments.json",
+                                           ["IOB"])
 
+        # History
+        if "history" in exports:
 
+            # Get recent history
+            self.history = Reporter.getRecent(self.now, "history.json", [], 1)
 
-    def fill(self):
+            # Get recent sensor statuses
+            self.statuses = Reporter.getRecent(self.now, "history.json",
+                                               ["CGM", "Sensor Statuses"])
+
+            # Get recent calibrations
+            self.calibrations = Reporter.getRecent(self.now, "history.json",
+                                                   ["CGM", "Calibrations"])
+
+        # Pump
+        if "pump" in exports:
+
+            # Get pump data
+            self.pump = Reporter.get("pump.json", [])
+
+
+
+    def fill(self, exports):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -138,21 +342,39 @@ class Exporter(object):
         # Info
         Logger.debug("Building recent data structures...")
 
-        # Fill BG report
-        self.reports["BG"].update(self.BGs)
+        # Reset reports to fill (previous exports should not stay in them)
+        for export in exports:
+
+            # Reset
+            self.reports[export].reset()
+
+        # BGs
+        if "BG" in exports:
+
+            # Fill BG report
+            self.reports["BG"].update(self.BGs)
+
+        # Treatments
+        if "treatments" in exports:
+
+            # Fill treatments report
+            self.reports["treatments"].update({"Net Basals": self.basals,
+                                               "Boluses": self.boluses,
+                                               "IOB": self.IOBs})
 
-        # Fill treatments report
-        self.reports["treatments"].update({"Net Basals": self.net,
-                                           "Boluses": self.boluses,
-                                           "IOB": self.IOBs})
+        # History
+        if "history" in exports:
 
-        # Fill history report
-        self.reports["history"].update(lib.mergeNDicts(self.history, {"CGM": {
-            "Sensor Statuses": self.statuses,
-            "Calibrations": self.calibrations}}))
+            # Fill history report
+            self.reports["history"].update(lib.mergeNDicts(self.history,
+                {"CGM": {"Sensor Statuses": self.statuses,
+                         "Calibrations": self.calibrations}}))
 
-        # Fill pump report
-        self.reports["pump"].update(self.pump)
+        # Pump
+        if "pump" in exports:
+
+            # Fill pump report
+            self.reports["pump"].update(self.pump)
 
 
 
@@ -162,6 +384,8 @@ class Exporter(object):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             RUN
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Only rebuild and store exported reports whose sources changed
+            since last export.
         """
 
         # Store current time
@@ -170,28 +394,56 @@ class Exporter(object):
         # Compute past time
         self.past = now - datetime.timedelta(hours = hours)
 
-        # Build it for last 24 hours
-        self.net.build(self.past, self.now, basal.Basal(),
-                                            TB.TB(),
-                                            suspend.Suspend(),
-                                            resume.Resume())
+        # Versions of last export not loaded yet
+        if self.versions is None:
+
+            # Load them
+            self.load()
+
+        # Get current versions of sources
+        versions = dict([(export, self.version(export))
+                         for export in self.reports])
+
+        # Find reports whose sources changed
+        exports = [export for export in self.reports
+                   if versions[export] != self.versions.get(export)]
+
+        # Nothing changed
+        if not exports:
+
+            # Info
+            Logger.info("Nothing new to export.")
 
-        # Format net profile
-        self.net = dict(zip([lib.formatTime(T) for T in self.net.T],
-                            [round(y, 2) for y in self.net.y]))
+            # Exit
+            return
+
+        # Info
+        Logger.info("Exporting: " + ", ".join(sorted(exports)))
 
         # Get data
-        self.get()
+        self.get(exports)
 
         # Fill reports
-        self.fill()
+        self.fill(exports)
 
         # Export reports
-        for report in self.reports.values():
+        for export in exports:
+
+            # Get report
+            report = self.reports[export]
 
             # Do it
             report.store(Reporter.exp.str)
 
+            # Remember sources used
+            self.versions[export] = versions[export]
+
+        # Store versions of sources used (so next run, even in a new
+        # process, skips unchanged reports)
+        Reporter.add(self.report, ["Versions"],
+                     dict([(export, self.versions[export])
+                           for export in exports]), True)
+
 
 
 def main():
@@ -0,0 +1,391 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Title:    history
+
+    Author:   David Leclerc
+
+    Version:  0.1
+
+    Date:     19.10.2026
+
+    License:  GNU General Public License, Version 3
+              (http://www.gnu.org/licenses/gpl.html)
+
+    Overview: Read-only view of BG and net insulin history, for any period, as
+              arrays of times (wall-clock s since 1970) and values.
+
+    Notes:    - Every day is converted once, then kept in a cache file
+                (Reports/Cache/...) which is memory-mapped on later reads. A
+                cache file gets the modification time of the report(s) it was
+                built from, and is rebuilt as soon as they change.
+              - BGs of archived days are read straight from their archive.
+              - Net insulin is a step profile (U/h): each value applies until
+                the next time.
+
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+
+# LIBRARIES
+import os
+import json
+import hashlib
+import datetime
+import numpy as np
+
+
+
+# USER LIBRARIES
+import lib
+import path
+import logger
+import metrics
+import reporter
+import archiver
+from Profiles import basal, TB, bolus, suspend, resume, net
+
+
+
+# Define instances
+Logger = logger.Logger("history.py")
+Reporter = reporter.Reporter()
+Metrics = metrics.Metrics()
+
+
+
+# CONSTANTS
+DTYPE = [("t", "<i8"), ("y", "<f4")]
+
+
+
+# CLASSES
+class History(object):
+
+    def __init__(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            INIT
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Define cache path
+        self.cache = path.Path(Reporter.src.str + "Cache")
+
+        # Define builders of day arrays
+        self.builders = {"BG": self.buildBG,
+                         "Net": self.buildNet}
+
+
+
+    def BG(self, start, end):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            BG
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return BG times and values within [start, end).
+        """
+
+        # Read them
+        return self.read("BG", start, end)
+
+
+
+    def net(self, start, end):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            NET
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return net insulin steps within [start, end).
+        """
+
+        # Read them
+        return self.read("Net", start, end)
+
+
+
+    def read(self, kind, start, end):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            READ
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Gather arrays of days within period, and cut them to it. Periods
+            within a single day are views of their mapped file.
+        """
+
+        # Start timer
+        t0 = Metrics.now()
+
+        # Get days of period
+        days = [start.date() + datetime.timedelta(days = d)
+                for d in range((end.date() - start.date()).days + 1)]
+
+        # Get their arrays
+        arrays = [self.day(kind, day) for day in days]
+
+        # Merge them (if needed)
+        if len(arrays) == 1:
+
+            # Only one
+            data = arrays[0]
+
+        # Otherwise
+        else:
+
+            # Concatenate
+            data = np.concatenate(arrays)
+
+        # Cut period
+        [i, j] = np.searchsorted(data["t"], [archiver.epoch(start),
+                                             archiver.epoch(end)])
+
+        # Update read timer
+        Metrics.time("History " + kind, t0)
+
+        # Return times and values
+        return [data["t"][i:j], data["y"][i:j]]
+
+
+
+    def day(self, kind, date):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            DAY
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return array of given day, from cache if still valid.
+        """
+
+        # Get builder, sources and cache file of day
+        [build, sources, filename] = self.builders[kind](date)
+
+        # Nothing to cache
+        if filename is None:
+
+            # Build array
+            return build()
+
+        # Get modification time of sources (None if no data)
+        mtime = max([None] + [os.path.getmtime(s) for s in sources
+                              if os.path.exists(s)])
+
+        # No data
+        if mtime is None:
+
+            # Return empty array
+            return np.zeros(0, DTYPE)
+
+        # Cache valid (file times are only set to the microsecond)
+        if (os.path.exists(filename) and
+            abs(os.path.getmtime(filename) - mtime) < 1e-3):
+
+            # Map it
+            return np.load(filename, "r")
+
+        # Give user info
+        Logger.debug("Caching " + kind + " history of: " + str(date))
+
+        # Build array
+        data = build()
+
+        # No data
+        if len(data) == 0:
+
+            # Return it (empty files cannot be mapped)
+            return data
+
+        # Make cache directory
+        path.Path(os.path.dirname(filename)).touch()
+
+        # Define temporary file (unique to process)
+        tmp = filename + "." + str(os.getpid()) + ".tmp"
+
+        # Write array to it
+        with open(tmp, "wb") as f:
+
+            # Write
+            np.save(f, data)
+
+        # Tag it with modification time of its sources
+        os.utime(tmp, (mtime, mtime))
+
+        # Replace cache file (atomic)
+        os.rename(tmp, filename)
+
+        # Map it
+        return np.load(filename, "r")
+
+
+
+    def sources(self, name, dates):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            SOURCES
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return files the given dated report is read from: its day files,
+            and the archives of their months.
+        """
+
+        # Initialize files
+        files = []
+
+        # Go through dates
+        for date in dates:
+
+            # Add day file and month archive
+            files += [Reporter.src.str + path.formatDate(date) + name,
+                      Reporter.src.str +
+                      date.strftime("%Y" + os.sep + "%m" + os.sep) +
+                      Reporter.getArchiveName(name)]
+
+        # Return them
+        return files
+
+
+
+    def buildBG(self, date):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            BUILDBG
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Define day file and month archive
+        [day, archive] = self.sources("BG.json", [date])
+
+        # Define period
+        start = datetime.datetime.combine(date, datetime.time())
+        end = start + datetime.timedelta(days = 1)
+
+        # Day archived: read it straight from archive (nothing to cache)
+        if not os.path.exists(day) and os.path.exists(archive):
+
+            # Read it
+            [t, y] = archiver.get(archive).read([], start, end)
+
+            # Return it (no parsing needed)
+            return [lambda: self.pack(t, y), [], None]
+
+        # Define builder
+        def build():
+
+            # Try
+            try:
+
+                # Read BGs
+                BGs = Reporter.get("BG.json", [], None, date)
+
+            # No BGs
+            except Exception:
+
+                # Empty
+                BGs = {}
+
+            # Sort them
+            keys = sorted(BGs)
+
+            # Return them
+            return self.pack([archiver.epoch(lib.formatTime(k))
+                              for k in keys], [BGs[k] for k in keys])
+
+        # Return builder, sources and cache file
+        return [build, [day, archive],
+                self.cache.str + "BG" + os.sep + str(date) + ".npy"]
+
+
+
+    def buildNet(self, date):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            BUILDNET
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Net insulin of a day depends on its treatments and those of the
+            day before (ongoing TBs), as well as on the basal profile (its
+            hash is part of the cache file's name).
+        """
+
+        # Read basal profile
+        profile = Reporter.get("pump.json", [], "Basal Profile (Standard)")
+
+        # Hash it
+        key = hashlib.md5(json.dumps(profile, sort_keys = True)).hexdigest()
+
+        # Define period
+        start = datetime.datetime.combine(date, datetime.time())
+        end = start + datetime.timedelta(days = 1)
+
+        # Define builder
+        def build():
+
+            # Build net insulin profile of day
+            profile = net.Net()
+            profile.build(start, end, basal.Basal(), TB.TB(),
+                          suspend.Suspend(), resume.Resume(), bolus.Bolus())
+
+            # Return its steps (without end of day)
+            return self.pack([archiver.epoch(T) for T in profile.T[:-1]],
+                             profile.y[:-1])
+
+        # Return builder, sources and cache file
+        return [build,
+                self.sources("treatments.json",
+                             [date - datetime.timedelta(days = 1), date]),
+                self.cache.str + "Net" + os.sep + str(date) + "." + key[:8] +
+                ".npy"]
+
+
+
+    def pack(self, t, y):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            PACK
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Initialize array
+        data = np.zeros(len(t), DTYPE)
+
+        # Fill it
+        data["t"] = t
+        data["y"] = y
+
+        # Return it
+        return data
+
+
+
+def main():
+
+    """
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        MAIN
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    """
+
+    # Get current time
+    now = datetime.datetime.now()
+
+    # Instanciate a history view
+    history = History()
+
+    # Read last week of BGs
+    [t, BG] = history.BG(now - datetime.timedelta(days = 7), now)
+
+    # Give user info
+    print "BGs: " + str(len(BG)) + " (mean: " + str(np.mean(BG)) + ")"
+
+
+
+# Run this when script is called from terminal
+if __name__ == "__main__":
+    main()
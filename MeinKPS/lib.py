@@ -114,6 +114,10 @@ CRC16_TABLE = [0, 4129, 8258, 12387, 16516, 20645, 24774, 28903,
 # Instanciate logger
 Logger = logger.Logger("lib.py")
 
+# Initialize times already parsed from strings (see formatTime): only
+# remembered when a dict is given here, e.g. for the length of a replay
+times = None
+
 
 
 # FUNCTIONS
@@ -279,9 +283,22 @@ def formatTime(t):
 
         t = datetime.datetime.strftime(t, f)
 
+    # Not a string (returned as is)
+    elif not isinstance(t, (str, unicode)):
+
+        pass
+
+    # Already parsed (same report entries are parsed over and over)
+    elif times is not None and t in times:
+
+        t = times[t]
+
     # Otherwise
     else:
 
+        # Remember string
+        s = t
+
         # Try first format
         try:
 
@@ -300,6 +317,11 @@ def formatTime(t):
 
             pass
 
+        # Remember parsed time
+        if times is not None:
+
+            times[s] = t
+
     # Return formatted time
     return t
 
@@ -471,6 +493,9 @@ def mergeNDicts(*args):
     ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         MERGENDICTS
     ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Note: base is copied once, then all dicts are merged into that copy in a
+          single pass (merging n dicts is linear, not quadratic).
     """
 
     # Verify number of args
@@ -482,17 +507,24 @@ def mergeNDicts(*args):
     # Destructure dicts
     base, args = args[0], args[1:]
 
+    # Copy base in order to not overwrite it
+    base = copy.copy(base)
+
     # Loop on dicts
     for new in args:
 
-        # Update base
-        base = mergeDicts(base, new)
+        # Check if dict given as input
+        if type(new) is not dict:
 
-    # Info
-    Logger.debug("New merged dictionary:")
+            # Exit
+            sys.exit("Only dicts can be merged.")
 
-    # Show it
-    Logger.debug(JSONize(base))
+        # Merge it into copy (as if nested, so base is not copied again)
+        mergeDicts(base, new, 2)
+
+    # Info
+    Logger.debug("Merged " + str(len(args) + 1) + " dictionaries (" +
+                 str(len(base)) + " entries).")
 
     # Return updated base
     return base
@@ -850,6 +882,36 @@ def computeCRC16(x):
 
 
 
+def computeCRC16s(x):
+
+    """
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        COMPUTECRC16S
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        Compute CRC16 of each row of given 2D array of bytes at once (same as
+        computeCRC16 for every row).
+    """
+
+    # Convert bytes to array
+    x = np.asarray(x, np.uint32)
+
+    # Convert CRC table to array
+    table = np.array(CRC16_TABLE, np.uint32)
+
+    # Initialize CRCs
+    CRCs = np.zeros(len(x), np.uint32)
+
+    # Look for CRCs in table, one byte column at a time
+    for i in range(x.shape[1]):
+
+        # Compute them
+        CRCs = ((CRCs << 8) & 0xFF00) ^ table[((CRCs >> 8) & 0xFF) ^ x[:, i]]
+
+    # Return CRCs
+    return CRCs & 0xFFFF
+
+
+
 def newComputeCRC16(x):
 
     """
@@ -37,6 +37,12 @@ LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
 
 
 
+# Define lowest level logged by all loggers (raised to silence them, e.g. when
+# replaying history)
+floor = 0
+
+
+
 # CLASSES
 class Logger(object):
 
@@ -62,6 +68,21 @@ class Logger(object):
 
 
 
+    def allows(self, level):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            ALLOWS
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Tell whether messages of given level are logged (lets callers skip
+            formatting costly ones).
+        """
+
+        # Compare levels
+        return LEVELS.index(level) >= max(self.level, floor)
+
+
+
     def log(self, level, msg, show = True):
 
         """
@@ -71,7 +92,7 @@ class Logger(object):
         """
 
         # Does level allow logging?
-        if LEVELS.index(level) >= self.level:
+        if self.allows(level):
 
             # Get current time
             now = datetime.datetime.now()
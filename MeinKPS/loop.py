@@ -25,15 +25,18 @@
 # LIBRARIES
 import datetime
 import time
+import threading
 
 
 
 # USER LIBRARIES
 import lib
 import logger
+import metrics
 import reporter
 import exporter
 import uploader
+import nightscout
 import calculator
 from CGM import cgm
 from Stick import stick
@@ -44,8 +47,10 @@ from Pump import pump
 # Define instances
 Logger = logger.Logger("loop.py")
 Reporter = reporter.Reporter()
+Metrics = metrics.Metrics()
 Exporter = exporter.Exporter()
 Uploader = uploader.Uploader()
+Nightscout = nightscout.Nightscout()
 
 
 
@@ -71,8 +76,22 @@ class Loop(object):
         # Give the loop a calculator
         self.calc = calculator.Calculator()
 
-        # Define report
+        # Initialize deadline before which loop should be done
+        self.deadline = None
+
+        # Define non-critical tasks and their time budgets (s), after which
+        # they are skipped if the deadline is too close
+        self.budgets = {"Battery": 10,
+                        "Export": 15,
+                        "Upload": 30,
+                        "Nightscout": 30}
+
+        # Initialize number of failed tasks
+        self.errors = 0
+
+        # Define reports
         self.report = "loop.json"
+        self.metrics = "metrics.json"
 
 
 
@@ -84,11 +103,63 @@ class Loop(object):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
+        # If task is non-critical
+        if key in self.budgets:
+
+            # If not enough time left to do it
+            if self.remaining() < self.budgets[key]:
+
+                # Give user info
+                Logger.warning("Not enough time left: skipping '" + key +
+                               "'.")
+
+                # Update loop log
+                Reporter.count(self.report, path, "Skipped " + key)
+
+                # Count skipped task
+                Metrics.count("Skipped " + key)
+
+                # Exit
+                return
+
+        # Define task starting time
+        t0 = time.time()
+
         # Do task
         task(*args)
 
-        # Update loop log
-        Reporter.increment(self.report, path, key)
+        # Update task timer
+        Metrics.time("Task " + " ".join(path + [key]), t0)
+
+        # If task took longer than its budget
+        if key in self.budgets and time.time() - t0 > self.budgets[key]:
+
+            # Give user info
+            Logger.warning("'" + key + "' exceeded its time budget (" +
+                           str(self.budgets[key]) + " s).")
+
+        # Update loop log (written once loop is done)
+        Reporter.count(self.report, path, key)
+
+
+
+    def remaining(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            REMAINING
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return time left (s) before deadline (infinite if none).
+        """
+
+        # No deadline
+        if self.deadline is None:
+
+            # Return infinite time
+            return float("inf")
+
+        # Otherwise
+        return (self.deadline - datetime.datetime.now()).total_seconds()
 
 
 
@@ -98,70 +169,129 @@ class Loop(object):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             DOTRY
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Do task, and return whether it succeeded.
         """
 
+        # Start timer
+        t0 = Metrics.now()
+
         # Try task
         try:
 
             # Do it
             task(*args)
 
+            # Success
+            success = True
+
         # Ignore all errors
         except Exception as e:
 
             # But log them
             Logger.error(e)
 
+            # Count them
+            self.errors += 1
+            Metrics.count("Errors")
+
+            # Failure
+            success = False
 
+        # Update stage timer
+        Metrics.time("Stage " + task.__name__, t0)
 
-    def start(self):
+        # Return whether task succeeded
+        return success
+
+
+
+    def start(self, devices = True):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             START
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Start loop. If asked to, start devices as well (otherwise, they
+            are started within their own thread).
         """
 
         # Define starting time
         self.t0 = datetime.datetime.now()
 
+        # Reset metrics
+        Metrics.reset()
+
         # Give user info
         Logger.info("Started loop.")
 
-        # Start CGM
-        self.cgm.start()
+        # Start devices
+        if devices:
 
-        # Start pump
-        self.pump.start()
+            # Start CGM
+            self.startCGM()
 
-        # LED on
-        self.pump.stick.commands["LED On"].run()
+            # Start pump
+            self.startPump()
 
         # Update last loop time
         Reporter.add(self.report, ["Status"],
                      {"Time": lib.formatTime(self.t0)}, True)
 
         # Update loop iterations
-        Reporter.increment(self.report, ["Status"], "N")
+        Reporter.count(self.report, ["Status"], "N")
+
+
+
+    def startCGM(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            STARTCGM
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
 
+        # Start CGM
+        self.cgm.start()
 
 
-    def stop(self):
+
+    def startPump(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            STARTPUMP
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Start pump
+        self.pump.start()
+
+        # LED on
+        self.pump.stick.commands["LED On"].run()
+
+
+
+    def stop(self, devices = True):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             STOP
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Stop loop. If asked to, stop devices as well (otherwise, they
+            stay ready for the next loop).
         """
 
-        # LED off
-        self.pump.stick.commands["LED Off"].run()
+        # Stop devices
+        if devices:
 
-        # Stop pump
-        self.pump.stop()
+            # LED off
+            self.pump.stick.commands["LED Off"].run()
 
-        # Stop CGM
-        self.cgm.stop()
+            # Stop pump
+            self.pump.stop()
+
+            # Stop CGM
+            self.cgm.stop()
 
         # Define ending time
         self.t1 = datetime.datetime.now()
@@ -174,6 +304,9 @@ class Loop(object):
                                   {"Duration": (self.t1 - self.t0).seconds},
                                   True)
 
+        # Store loop metrics
+        Reporter.add(self.metrics, [], {self.t0: Metrics.summarize()})
+
 
 
     def doCGM(self):
@@ -184,17 +317,23 @@ class Loop(object):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
-        # Read BGs (last 24 hours)
-        self.do(self.cgm.dumpBG, ["CGM"], "BG", 8)
+        # Write everything read from CGM together (each report file is then
+        # loaded and stored only once)
+        with Reporter.batch():
 
-        # Read battery
-        self.do(self.cgm.battery.read, ["CGM"], "Battery")
+            # Read new BGs (within last 24 hours)
+            self.do(self.cgm.dumpBG, ["CGM"], "BG", 8, True)
 
-        # Read sensor events
-        self.do(self.cgm.databases["Sensor"].read, ["CGM"], "Sensor")
+            # Read battery
+            self.do(self.cgm.battery.read, ["CGM"], "Battery")
 
-        # Read calibrations
-        self.do(self.cgm.databases["Calibration"].read, ["CGM"], "Calibration")
+            # Read new sensor events
+            self.do(self.cgm.databases["Sensor"].read, ["CGM"], "Sensor",
+                    None, True)
+
+            # Read new calibrations
+            self.do(self.cgm.databases["Calibration"].read, ["CGM"],
+                    "Calibration", None, True)
 
 
 
@@ -206,26 +345,64 @@ class Loop(object):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
+        # Read pump
+        self.readPump()
+
+        # Compute and enact TB
+        self.doTB()
+
+
+
+    def readPump(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            READPUMP
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Read everything the calculator needs from the pump.
+        """
+
         # Read battery level
-        self.do(self.pump.battery.read, ["Pump"], "Battery")
+        self.pump.session.add("Battery", self.do, self.pump.battery.read,
+                              ["Pump"], "Battery")
 
         # Read remaining amount of insulin
-        self.do(self.pump.reservoir.read, ["Pump"], "Reservoir")
+        self.pump.session.add("Reservoir", self.do, self.pump.reservoir.read,
+                              ["Pump"], "Reservoir")
 
-        # Read ISF
-        self.do(self.pump.ISF.read, ["Pump"], "ISF")
+        # Read ISF (if cached one expired)
+        self.pump.session.add("ISF", self.do, self.pump.ISF.update,
+                              ["Pump"], "ISF")
 
-        # Read CSF
-        self.do(self.pump.CSF.read, ["Pump"], "CSF")
+        # Read CSF (if cached one expired)
+        self.pump.session.add("CSF", self.do, self.pump.CSF.update,
+                              ["Pump"], "CSF")
 
-        # Read BG targets
-        self.do(self.pump.BGTargets.read, ["Pump"], "BG Targets")
+        # Read BG targets (if cached ones expired)
+        self.pump.session.add("BG Targets", self.do,
+                              self.pump.BGTargets.update,
+                              ["Pump"], "BG Targets")
 
-        # Read basal
-        self.do(self.pump.basal.read, ["Pump"], "Basal", "Standard")
+        # Read basal (if cached one expired)
+        self.pump.session.add("Basal", self.do, self.pump.basal.update,
+                              ["Pump"], "Basal", "Standard")
 
         # Update history
-        self.do(self.pump.history.update, ["Pump"], "History")
+        self.pump.session.add("History", self.do, self.pump.history.update,
+                              ["Pump"], "History")
+
+        # Run pump tasks back-to-back within one RF session
+        self.pump.session.run()
+
+
+
+    def doTB(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            DOTB
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
 
         # Run calculator and get recommendation
         TB = self.calc.run(self.t0)
@@ -234,25 +411,31 @@ class Loop(object):
         if TB is None:
 
             # Get current TB
-            self.pump.TB.read()
+            self.pump.session.add("TB Read", self.pump.TB.read)
+
+            # Run it
+            self.pump.session.run()
 
             # If TB currently set
             if self.pump.TB.value["Duration"] != 0:
 
                 # Cancel it
-                self.pump.TB.cancel()
+                self.pump.session.add("TB Cancel", self.pump.TB.cancel)
 
                 # Re-update history
-                self.pump.history.update
+                self.pump.session.add("History", self.pump.history.update)
 
         # Otherwise, enact recommendation
         else:
 
             # Enact TB
-            self.pump.TB.set(*TB)
+            self.pump.session.add("TB Set", self.pump.TB.set, *TB)
 
             # Re-update history
-            self.pump.history.update
+            self.pump.session.add("History", self.pump.history.update)
+
+        # Run remaining pump tasks
+        self.pump.session.run()
 
         # Acknowledge TB was done
         self.do(lib.NOP, ["Pump"], "TB")
@@ -286,30 +469,151 @@ class Loop(object):
         # Upload stuff
         self.do(Uploader.run, ["Status"], "Upload")
 
+        # Mirror data to Nightscout
+        self.do(Nightscout.run, ["Status"], "Nightscout", self.t0)
 
 
-    def run(self):
+
+    def doDevices(self, start = True):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            RUN
+            DODEVICES
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Start and read CGM and pump concurrently (they are on different
+            USB devices), then wait for both before going on, since the
+            calculator needs their data. Return whether both succeeded.
         """
 
-        # Start loop
-        self.doTry(self.start)
+        # Initialize worker results (errors are swallowed within workers)
+        results = {}
+
+        # Define CGM and pump workers
+        threads = [threading.Thread(target = self.doCGMThread,
+                                    args = [start, results]),
+                   threading.Thread(target = self.doPumpThread,
+                                    args = [start, results])]
+
+        # Start them
+        for thread in threads:
+
+            # Start
+            thread.start()
+
+        # Wait for them to be done
+        for thread in threads:
+
+            # Join
+            thread.join()
+
+        # Return whether both workers succeeded
+        return results.get("CGM", False) and results.get("Pump", False)
+
+
+
+    def doCGMThread(self, start = True, results = None):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            DOCGMTHREAD
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Record in given results whether CGM was started and read.
+        """
+
+        # Initialize success
+        success = True
+
+        # If CGM needs to be started
+        if start:
+
+            # Start CGM
+            success = self.doTry(self.startCGM)
 
         # Do CGM stuff
-        self.doTry(self.doCGM)
+        success = self.doTry(self.doCGM) and success
 
-        # Do pump stuff
-        self.doTry(self.doPump)
+        # Record success
+        if results is not None:
+            results["CGM"] = success
+
+
+
+    def doPumpThread(self, start = True, results = None):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            DOPUMPTHREAD
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Record in given results whether pump was started and read.
+        """
+
+        # Initialize success
+        success = True
+
+        # If pump needs to be started
+        if start:
+
+            # Start pump
+            success = self.doTry(self.startPump)
+
+        # Read pump
+        success = self.doTry(self.readPump) and success
+
+        # Record success
+        if results is not None:
+            results["Pump"] = success
+
+
+
+    def run(self, parallel = True, devices = True):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            RUN
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Run loop. If devices are already started (e.g. by the loop
+            daemon), they are neither restarted nor stopped.
+        """
+
+        # Talk to devices concurrently
+        if parallel:
+
+            # Start loop
+            self.doTry(self.start, False)
+
+            # Start (if needed) and read devices, then, only if both were
+            # read (as in sequential pump stuff), compute and enact TB
+            if self.doDevices(devices):
+
+                # Compute and enact TB
+                self.doTry(self.doTB)
+
+            # Otherwise
+            else:
+
+                # Give user info
+                Logger.warning("Devices could not be read: skipping TB.")
+
+        # Otherwise
+        else:
+
+            # Start loop
+            self.doTry(self.start, devices)
+
+            # Do CGM stuff
+            self.doTry(self.doCGM)
+
+            # Do pump stuff
+            self.doTry(self.doPump)
 
         # Export recent treatments
         self.doTry(self.export)
 
         # Stop loop
-        self.doTry(self.stop)
+        self.doTry(self.stop, devices)
+
+        # Write loop log
+        self.doTry(Reporter.commit, self.report)
 
 
 
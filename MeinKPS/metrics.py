@@ -0,0 +1,185 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Title:    metrics
+
+    Author:   David Leclerc
+
+    Version:  0.1
+
+    Date:     19.10.2026
+
+    License:  GNU General Public License, Version 3
+              (http://www.gnu.org/licenses/gpl.html)
+
+    Overview: In-memory timers and counters, shared by all modules, which are
+              summarized once per loop.
+
+    Notes:    Timers keep a histogram of their durations, using buckets which
+              double in size (upper bounds in ms: 1, 2, 4, 8, ...).
+
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+
+# LIBRARIES
+import time
+import threading
+
+
+
+# Define data shared by all instances (metrics may come from threads)
+timers = {}
+counters = {}
+lock = threading.Lock()
+
+
+
+# CLASSES
+class Metrics(object):
+
+    def __init__(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            INIT
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Ignore
+        pass
+
+
+
+    def reset(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            RESET
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Lock metrics
+        with lock:
+
+            # Reset them
+            timers.clear()
+            counters.clear()
+
+
+
+    def now(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            NOW
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return time reference for timers.
+        """
+
+        # Return it
+        return time.time()
+
+
+
+    def time(self, name, t0):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            TIME
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Add duration since given time reference to timer.
+        """
+
+        # Add duration (s)
+        self.record(name, time.time() - t0)
+
+
+
+    def record(self, name, dt):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            RECORD
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Add given duration (s) to timer.
+        """
+
+        # Find histogram bucket (ms)
+        bucket = 1
+
+        # Double bucket size until duration fits in it
+        while bucket < dt * 1000:
+
+            # Double it
+            bucket *= 2
+
+        # Lock metrics
+        with lock:
+
+            # New timer
+            if name not in timers:
+
+                # Initialize it
+                timers[name] = {"N": 0, "Total": 0, "Max": 0, "Histogram": {}}
+
+            # Get it
+            timer = timers[name]
+
+            # Update it
+            timer["N"] += 1
+            timer["Total"] += dt
+            timer["Max"] = max(timer["Max"], dt)
+            timer["Histogram"][bucket] = timer["Histogram"].get(bucket, 0) + 1
+
+
+
+    def count(self, name, n = 1):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            COUNT
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Lock metrics
+        with lock:
+
+            # Update counter
+            counters[name] = counters.get(name, 0) + n
+
+
+
+    def summarize(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            SUMMARIZE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return compact (JSON-compatible) record of current metrics.
+        """
+
+        # Initialize record
+        record = {"Timers": {}, "Counters": {}}
+
+        # Lock metrics
+        with lock:
+
+            # Summarize timers (durations in ms)
+            for name, timer in timers.items():
+
+                # Store summary
+                record["Timers"][name] = {
+                    "N": timer["N"],
+                    "Total": round(timer["Total"] * 1000, 1),
+                    "Max": round(timer["Max"] * 1000, 1),
+                    "Histogram": dict([(str(b), n) for b, n in
+                                       timer["Histogram"].items()])}
+
+            # Copy counters
+            record["Counters"].update(counters)
+
+        # Return record
+        return record
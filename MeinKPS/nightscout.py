@@ -0,0 +1,600 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Title:    nightscout
+
+    Author:   David Leclerc
+
+    Version:  0.1
+
+    Date:     19.10.2026
+
+    License:  GNU General Public License, Version 3
+              (http://www.gnu.org/licenses/gpl.html)
+
+    Overview: This is a script that uploads BGs, treatments and device
+              statuses to a Nightscout site, using its REST API.
+
+    Notes:    - New report entries (after each source's watermark) are
+                converted to Nightscout documents and queued in a persistent
+                outbox, which is then flushed in batches. If the site cannot
+                be reached, documents stay in the outbox and uploads are
+                retried later with an exponential backoff.
+              - Every document has an ID ("_id") derived from its source and
+                time, so sending it twice (e.g. after a request timed out once
+                the site already stored it) does not create duplicates: the
+                site refuses to store a second document with the same ID.
+              - Configuration (Nightscout.json): "URL", "API Secret".
+
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+
+# LIBRARIES
+import json
+import time
+import urllib2
+import hashlib
+import datetime
+
+
+
+# USER LIBRARIES
+import lib
+import errors
+import logger
+import metrics
+import reporter
+
+
+
+# Define instances
+Logger = logger.Logger("nightscout.py")
+Reporter = reporter.Reporter()
+Metrics = metrics.Metrics()
+
+
+
+# CONSTANTS
+DEVICE = "MeinKPS"
+EXCHANGE = 15
+
+
+
+# CLASSES
+class Nightscout(object):
+
+    def __init__(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            INIT
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Define report (outbox, watermarks and backoff)
+        self.report = "outbox.json"
+
+        # Initialize state
+        self.state = None
+
+        # Initialize configuration
+        self.config = None
+
+        # Define sources: report, branch and Nightscout collection
+        self.sources = {"BG": ["BG.json", [], "entries"],
+                        "Boluses": ["treatments.json", ["Boluses"],
+                                    "treatments"],
+                        "TBs": ["treatments.json", ["Temporary Basals"],
+                                "treatments"],
+                        "Carbs": ["treatments.json", ["Carbs"],
+                                  "treatments"],
+                        "IOB": ["treatments.json", ["IOB"],
+                                "devicestatus"],
+                        "Reservoir": ["history.json",
+                                      ["Pump", "Reservoir Levels"],
+                                      "devicestatus"]}
+
+        # Define converters of source entries to documents
+        self.converters = {"BG": self.convertBG,
+                           "Boluses": self.convertBolus,
+                           "TBs": self.convertTB,
+                           "Carbs": self.convertCarbs,
+                           "IOB": self.convertIOB,
+                           "Reservoir": self.convertReservoir}
+
+        # Define max number of documents per request
+        self.batch = 250
+
+        # Define how far back to look on first upload (h)
+        self.hours = 24
+
+        # Define backoff delays (s)
+        self.delays = {"Min": 60, "Max": 3600}
+
+        # Define request timeout (s)
+        self.timeout = 30
+
+
+
+    def configure(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            CONFIGURE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Read site configuration once. Return whether there is a site to
+            upload to.
+        """
+
+        # Not read yet
+        if self.config is None:
+
+            # Try
+            try:
+
+                # Read it
+                self.config = Reporter.get("Nightscout.json", [])
+
+            # No site defined
+            except (errors.NoReport, errors.NoSection):
+
+                # Info
+                Logger.debug("No Nightscout site defined.")
+
+                # Exit
+                return False
+
+        # Site defined
+        return True
+
+
+
+    def load(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            LOAD
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Load state
+        self.state = Reporter.getReport(self.report)
+
+        # Make sure it has all its sections
+        self.state.json.setdefault("Outbox", {})
+        self.state.json.setdefault("Watermarks", {})
+        self.state.json.setdefault("Backoff", {})
+
+
+
+    def stamp(self, t):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            STAMP
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Convert local time to epoch (ms) and ISO 8601 (UTC) string.
+        """
+
+        # Compute epoch (s)
+        epoch = time.mktime(t.timetuple())
+
+        # Return both
+        return [int(epoch * 1000),
+                datetime.datetime.utcfromtimestamp(epoch).strftime(
+                    "%Y-%m-%dT%H:%M:%SZ")]
+
+
+
+    def identify(self, source, t):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            IDENTIFY
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Generate ID of document, which only depends on its source and
+            time (same document always gets same ID). It is a valid MongoDB
+            object ID (24 hex digits).
+        """
+
+        # Hash source and time
+        return hashlib.md5(source + " " + lib.formatTime(t)).hexdigest()[:24]
+
+
+
+    def convertBG(self, t, BG):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            CONVERTBG
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Get time stamps
+        [epoch, iso] = self.stamp(t)
+
+        # Return entry (Nightscout uses mg/dL)
+        return {"type": "sgv",
+                "sgv": int(round(BG * 18)),
+                "date": epoch,
+                "dateString": iso,
+                "device": DEVICE}
+
+
+
+    def convertBolus(self, t, bolus):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            CONVERTBOLUS
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Return treatment
+        return {"eventType": "Correction Bolus",
+                "insulin": bolus,
+                "created_at": self.stamp(t)[1],
+                "enteredBy": DEVICE}
+
+
+
+    def convertTB(self, t, TB):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            CONVERTTB
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Destructure TB
+        [rate, units, duration] = TB
+
+        # Generate treatment
+        treatment = {"eventType": "Temp Basal",
+                     "duration": duration,
+                     "created_at": self.stamp(t)[1],
+                     "enteredBy": DEVICE}
+
+        # Absolute TB
+        if units == "U/h":
+
+            # Add rate
+            treatment["absolute"] = rate
+
+        # Otherwise
+        else:
+
+            # Add relative rate
+            treatment["percent"] = rate - 100
+
+        # Return it
+        return treatment
+
+
+
+    def convertCarbs(self, t, carbs):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            CONVERTCARBS
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Destructure carbs
+        [C, CU] = carbs
+
+        # Convert exchanges to grams
+        if CU == "exchange":
+
+            # Convert
+            C *= EXCHANGE
+
+        # Return treatment
+        return {"eventType": "Carb Correction",
+                "carbs": C,
+                "created_at": self.stamp(t)[1],
+                "enteredBy": DEVICE}
+
+
+
+    def convertIOB(self, t, IOB):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            CONVERTIOB
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Get ISO time
+        iso = self.stamp(t)[1]
+
+        # Return device status
+        return {"device": DEVICE,
+                "created_at": iso,
+                "openaps": {"iob": {"iob": IOB, "timestamp": iso}}}
+
+
+
+    def convertReservoir(self, t, reservoir):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            CONVERTRESERVOIR
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Get ISO time
+        iso = self.stamp(t)[1]
+
+        # Return device status
+        return {"device": DEVICE,
+                "created_at": iso,
+                "pump": {"reservoir": reservoir, "clock": iso}}
+
+
+
+    def collect(self, now):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            COLLECT
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Convert entries which are newer than their source's watermark to
+            documents, and queue them in outbox.
+        """
+
+        # Get outbox and watermarks
+        outbox = self.state.json["Outbox"]
+        watermarks = self.state.json["Watermarks"]
+
+        # Go through sources
+        for source, [name, branch, collection] in self.sources.items():
+
+            # Get watermark
+            watermark = lib.formatTime(watermarks.get(source))
+
+            # None yet
+            if watermark is None:
+
+                # Only look at recent past
+                watermark = now - datetime.timedelta(hours = self.hours)
+
+            # Compute number of days to look at
+            n = (now.date() - watermark.date()).days + 1
+
+            # Get entries of these days
+            entries = Reporter.getRecent(now, name, branch, n, True)
+
+            # Only keep new ones
+            keys = sorted([k for k in entries
+                           if k > lib.formatTime(watermark)])
+
+            # Nothing new
+            if not keys:
+
+                # Skip
+                continue
+
+            # Get collection's queue
+            queue = outbox.setdefault(collection, {})
+
+            # Convert and queue entries
+            for key in keys:
+
+                # Get time
+                t = lib.formatTime(key)
+
+                # Convert entry
+                document = self.converters[source](t, entries[key])
+
+                # Identify it
+                document["_id"] = self.identify(source, t)
+
+                # Queue it
+                queue[document["_id"]] = document
+
+            # Move watermark
+            watermarks[source] = keys[-1]
+
+            # Info
+            Logger.debug("Queued " + str(len(keys)) + " new document(s) " +
+                         "from: " + source)
+
+        # Store state (documents now safely queued)
+        self.state.store()
+
+
+
+    def post(self, collection, documents):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            POST
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            If site refuses documents because some of them are already stored
+            (duplicate ID), send them again one by one, and skip those.
+        """
+
+        # Start timer
+        t0 = Metrics.now()
+
+        # Build request
+        request = urllib2.Request(self.config["URL"] + "/api/v1/" + collection,
+                                  json.dumps(documents),
+                                  {"Content-Type": "application/json",
+                                   "API-SECRET": hashlib.sha1(
+                                       self.config["API Secret"]).hexdigest()})
+
+        # Try
+        try:
+
+            # Send it
+            urllib2.urlopen(request, timeout = self.timeout).read()
+
+        # Documents refused
+        except urllib2.HTTPError as e:
+
+            # Not because of a duplicate ID (MongoDB error code)
+            if "E11000" not in e.read():
+
+                # Raise error
+                raise
+
+            # Only some documents already stored
+            if len(documents) > 1:
+
+                # Send documents one by one
+                for document in documents:
+
+                    # Send
+                    self.post(collection, [document])
+
+                # Exit
+                return
+
+            # Info
+            Logger.debug("Document already stored: " + documents[0]["_id"])
+
+            # Exit
+            return
+
+        # Update request timer
+        Metrics.time("Nightscout Request", t0)
+
+        # Count documents sent
+        Metrics.count("Nightscout Documents", len(documents))
+
+
+
+    def flush(self, now):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            FLUSH
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Send queued documents in batches. On failure, stop and wait longer
+            and longer (exponential backoff) before trying again.
+        """
+
+        # Get outbox and backoff
+        outbox = self.state.json["Outbox"]
+        backoff = self.state.json["Backoff"]
+
+        # Still backing off
+        if "Until" in backoff and now < lib.formatTime(backoff["Until"]):
+
+            # Info
+            Logger.info("Nightscout unreachable: next try at " +
+                        backoff["Until"])
+
+            # Exit
+            return
+
+        # Try
+        try:
+
+            # Go through collections
+            for collection in sorted(outbox):
+
+                # Get queue
+                queue = outbox[collection]
+
+                # Send documents in batches (oldest first)
+                while queue:
+
+                    # Get batch
+                    IDs = sorted(queue, key = lambda ID:
+                                 queue[ID].get("date",
+                                               queue[ID].get("created_at"))
+                                 )[:self.batch]
+
+                    # Send it
+                    self.post(collection, [queue[ID] for ID in IDs])
+
+                    # Remove sent documents from outbox
+                    for ID in IDs:
+
+                        # Remove
+                        del queue[ID]
+
+                    # Store state
+                    self.state.store()
+
+            # Reset backoff
+            backoff.clear()
+
+        # Site unreachable
+        except (urllib2.URLError, IOError) as e:
+
+            # Double delay (within limits)
+            delay = min(2 * backoff.get("Delay", self.delays["Min"] / 2),
+                        self.delays["Max"])
+
+            # Store it
+            backoff["Delay"] = delay
+            backoff["Until"] = lib.formatTime(now +
+                                              datetime.timedelta(
+                                                  seconds = delay))
+
+            # Info
+            Logger.warning("Could not reach Nightscout (" + str(e) + "): " +
+                           "retrying in " + str(delay) + " s.")
+
+        # Always
+        finally:
+
+            # Store state
+            self.state.store()
+
+
+
+    def run(self, now):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            RUN
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # No site to upload to
+        if not self.configure():
+
+            # Exit
+            return
+
+        # Load state
+        self.load()
+
+        # Queue new documents
+        self.collect(now)
+
+        # Send them
+        self.flush(now)
+
+
+
+def main():
+
+    """
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        MAIN
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    """
+
+    # Get current time
+    now = datetime.datetime.now()
+
+    # Instanciate a Nightscout uploader
+    nightscout = Nightscout()
+
+    # Run it
+    nightscout.run(now)
+
+
+
+# Run this when script is called from terminal
+if __name__ == "__main__":
+    main()
@@ -241,6 +241,8 @@ class Path:
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             SCAN
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return directories containing given file. If a list of files is
+            given, return paths of all of them instead (single scan).
         """
 
         # On first run
@@ -274,6 +276,12 @@ class Path:
                     # Store path
                     results.append(os.getcwd())
 
+                # Check if filename is one of those looked for
+                elif type(file) is list and f in file:
+
+                    # Store path to file
+                    results.append(os.path.join(os.getcwd(), f))
+
             # If directory and a digit (because a date)
             elif os.path.isdir(f) and f.isdigit():
 
@@ -30,8 +30,12 @@
 
 
 # LIBRARIES
+import os
 import json
+import fcntl
 import datetime
+import threading
+import contextlib
 
 
 
@@ -40,11 +44,26 @@ import lib
 import path
 import logger
 import errors
+import metrics
+import archiver
 
 
 
-# Instanciate logger
+# Define instances
 Logger = logger.Logger("reporter.py")
+Metrics = metrics.Metrics()
+
+# Define lock shared by all reporters (reports may be updated from threads)
+lock = threading.RLock()
+
+# Initialize pending counter increments (by report)
+counts = {}
+
+# Initialize batched updates (by thread)
+batches = threading.local()
+
+# Initialize reports frozen in memory (by thread)
+snapshots = threading.local()
 
 
 
@@ -65,6 +84,9 @@ class Reporter:
         # Define export path
         self.exp = path.Path(self.src.str + "Export")
 
+        # Define dated reports which are archived once their month is over
+        self.archived = ["BG.json", "treatments.json", "history.json"]
+
 
 
     def getDates(self, name):
@@ -75,37 +97,140 @@ class Reporter:
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
+        # Get dates frozen in memory (if any)
+        frozen = getattr(snapshots, "dates", None)
+
+        # Dates of report already frozen
+        if frozen is not None and name in frozen:
+
+            # Return them
+            return frozen[name]
+
         # Initialize dates
         dates = []
 
-        # Scan for all possible report directories
-        directories = self.src.scan(name)
+        # Scan for report files and archives (in one pass)
+        files = self.src.scan([name, self.getArchiveName(name)])
 
         # If no possible reports found
-        if not directories:
+        if not files:
 
             # Give user info
             Logger.debug("No dated report found for '" + name + "'.")
 
-        # Otherwise
-        else:
+        # Go through files
+        for f in files:
 
-            # Convert paths to dates
-            dates = [path.Path(d).date() for d in directories]
+            # Report file
+            if os.path.basename(f) == name:
 
-        # Return dates
+                # Convert path to date
+                dates.append(path.Path(os.path.dirname(f)).date())
+
+            # Archive
+            else:
+
+                # Add archived dates
+                dates.extend(archiver.get(f).dates())
+
+        # Remove duplicates of restored days
+        dates = sorted(set(dates))
+
+        # Freeze them (if needed)
+        if frozen is not None:
+
+            # Store them
+            frozen[name] = dates
+
+        # Return them
         return dates
 
 
 
-    def getReport(self, name, date = None, directory = None, touch = True):
+    def getArchiveName(self, name):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            GETARCHIVENAME
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Return archive filename of report
+        return os.path.splitext(name)[0] + ".npz"
+
+
+
+    def getArchive(self, name, date):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            GETARCHIVE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return archive of report for month of given date (None if there
+            is none).
+        """
+
+        # Get it
+        return archiver.get(self.src.str +
+                            date.strftime("%Y" + os.sep + "%m" + os.sep) +
+                            self.getArchiveName(name))
+
+
+
+    def getReport(self, name, date = None, directory = None, touch = True,
+                  exclusive = False):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             GETREPORT
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            If exclusive access is required, report is locked before being
+            loaded, and has to be unlocked by caller once stored. Within a
+            snapshot, reports only read are loaded once, then kept in memory.
         """
 
+        # Get reports frozen in memory (if any)
+        frozen = getattr(snapshots, "reports", None)
+
+        # Only reading within snapshot
+        if frozen is not None and not touch and not exclusive:
+
+            # Define report key
+            key = (name, date, directory)
+
+            # Report not frozen yet
+            if key not in frozen:
+
+                # Load it from disk (outside of snapshot)
+                snapshots.reports = None
+
+                # Try
+                try:
+
+                    # Load it
+                    frozen[key] = self.getReport(name, date, directory, False)
+
+                # Missing or invalid reports stay so within snapshot
+                except Exception as e:
+
+                    # Store error
+                    frozen[key] = e
+
+                # Always
+                finally:
+
+                    # Back to snapshot
+                    snapshots.reports = frozen
+
+            # Report could not be loaded
+            if isinstance(frozen[key], Exception):
+
+                # Re-throw error
+                raise frozen[key]
+
+            # Return it
+            return frozen[key]
+
         # Default directory
         if directory is None:
 
@@ -115,12 +240,38 @@ class Reporter:
         # Otherwise
         if date is not None:
 
+            # Get archive of report's month (only for source reports)
+            archive = (directory == self.src.str and
+                       self.getArchive(name, date))
+
             # Format date
             date = path.formatDate(date)
 
             # Update path to report
             directory = path.Path(directory + date).str
 
+            # Report archived (and not restored yet)
+            if archive and not os.path.exists(directory + name):
+
+                # Rebuild it
+                json = archive.day(path.Path(directory).date())
+
+                # Archived day found
+                if json is not None:
+
+                    # Generate report from archive
+                    report = Report(name, directory, date, json)
+
+                    # Only reading: return it
+                    if not touch and not exclusive:
+
+                        # Return it
+                        return report
+
+                    # Otherwise restore it, so it can be updated (report then
+                    # overrides archived day)
+                    self.restore(report)
+
         # If report can be generated in case it doesn't exist yet
         if touch:
 
@@ -130,14 +281,69 @@ class Reporter:
         # Generate new report
         report = Report(name, directory, date)
 
-        # Load its JSON
-        report.load()
+        # If exclusive access required
+        if exclusive:
+
+            # Lock report
+            report.lock()
+
+        # Try
+        try:
+
+            # Load its JSON
+            report.load()
+
+        # In case of error
+        except:
+
+            # Release report
+            report.unlock()
+
+            # Re-throw error
+            raise
 
         # Return it
         return report
 
 
 
+    def restore(self, report):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            RESTORE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Write archived report back to its own file (unless another
+            process just did).
+        """
+
+        # Give user info
+        Logger.debug("Restoring archived report: '" + report.name + "' (" +
+                     report.date + ")")
+
+        # Make its directory
+        path.Path(report.directory).touch()
+
+        # Lock report
+        report.lock()
+
+        # Try
+        try:
+
+            # Not restored yet
+            if not os.path.exists(report.directory + report.name):
+
+                # Store it
+                report.store()
+
+        # Always
+        finally:
+
+            # Release report
+            report.unlock()
+
+
+
     def getSection(self, report, branch, make = False):
 
         """
@@ -185,8 +391,11 @@ class Reporter:
         # Give user info
         Logger.debug("Section found.")
 
-        # Show section
-        Logger.debug(lib.JSONize(section))
+        # Show section (if debugging: formatting large ones is slow)
+        if Logger.allows("DEBUG"):
+
+            # Show it
+            Logger.debug(lib.JSONize(section))
 
         # Return section
         return section
@@ -312,6 +521,8 @@ class Reporter:
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             ADD
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Within a batch, entries are only queued, and written once it is
+            done.
         """
 
         # No entries
@@ -323,59 +534,215 @@ class Reporter:
             # Exit
             return
 
-        # Get first value
-        zero = min(entries)
+        # Reports frozen (replaying history)
+        if getattr(snapshots, "reports", None) is not None:
+
+            # Info
+            Logger.debug("Reports frozen: skipping update of '" + name + "'.")
+
+            # Exit
+            return
+
+        # Define update
+        update = [name, branch, entries, overwrite]
 
-        # If entries are dated
-        if type(zero) is datetime.datetime:
+        # If batching updates
+        if getattr(batches, "updates", None) is not None:
 
-            # Initialize date
-            date = zero.date()
+            # Queue update
+            batches.updates.append(update)
 
         # Otherwise
         else:
 
-            # Initialize date
-            date = None
+            # Write it right away
+            self.addMany([update])
 
-        # Load report
-        report = self.getReport(name, date)
 
-        # Get section
-        section = self.getSection(report, branch, True)
 
-        # Loop through entries
-        for key in sorted(entries):
+    def addMany(self, updates):
 
-            # Get value
-            value = entries[key]
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            ADDMANY
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Apply updates ([name, branch, entries, overwrite]) for any number
+            of reports and days. They are grouped by report file, which are
+            all locked (in a fixed order, so processes cannot deadlock),
+            loaded once, updated, and stored once (if modified) before any of
+            them is released.
+        """
 
-            # If date
-            if date is not None:
+        # Initialize entries by report file
+        files = {}
 
-                # If date is different than previous one
-                if key.date() != date:
+        # Group entries by report file
+        for name, branch, entries, overwrite in updates:
 
-                    # Update date
-                    date = key.date()
+            # Loop through entries
+            for key, value in entries.items():
 
-                    # Store last loaded report
-                    report.store()
+                # If entry is dated
+                if type(key) is datetime.datetime:
 
-                    # Load new report
-                    report = self.getReport(name, date)
+                    # Get report date and format key
+                    date, key = key.date(), lib.formatTime(key)
 
-                    # Get section
-                    section = self.getSection(report, branch, True)
+                # Otherwise
+                else:
 
-                # Format key
-                key = lib.formatTime(key)
+                    # Undated report
+                    date = None
+
+                # Store entry
+                files.setdefault((name, date), []).append(
+                    [branch, key, value, overwrite])
+
+        # Nothing to write
+        if not files:
+
+            # Info
+            Logger.debug("No entries to add.")
+
+            # Exit
+            return
+
+        # Make sure no other thread is updating reports at the same time
+        with lock:
+
+            # Initialize loaded reports
+            reports = []
+
+            # Try
+            try:
+
+                # Go through report files
+                for name, date in sorted(files):
+
+                    # Load report with exclusive access (so entries are
+                    # added to its current state, and other processes wait
+                    # until they are stored)
+                    report = self.getReport(name, date, None, True, True)
 
-            # Add entry
-            self.addEntry(section, {key: value}, overwrite)
+                    # Remember it
+                    reports.append(report)
 
-        # Store report
-        report.store()
+                    # Initialize report state
+                    modified = False
+
+                    # Loop through entries (sorted by time)
+                    for branch, key, value, overwrite in sorted(
+                        files[(name, date)], key = lambda x: x[1]):
+
+                        # Get section
+                        section = self.getSection(report, branch, True)
+
+                        # Add entry
+                        if self.addEntry(section, {key: value}, overwrite):
+
+                            # Report was modified
+                            modified = True
+
+                    # Report was modified
+                    if modified:
+
+                        # Store it
+                        report.store()
+
+            # Always
+            finally:
+
+                # Release reports
+                for report in reports:
+
+                    # Unlock
+                    report.unlock()
+
+
+
+    @contextlib.contextmanager
+    def batch(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            BATCH
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Queue all updates added by current thread within block, and
+            write them together once it is done (even if it fails, so data
+            read before failure is kept). Reads within block do not see
+            queued updates.
+        """
+
+        # Already batching (outer batch writes everything)
+        if getattr(batches, "updates", None) is not None:
+
+            # Run block
+            yield
+
+            # Exit
+            return
+
+        # Start batch
+        batches.updates = []
+
+        # Try
+        try:
+
+            # Run block
+            yield
+
+        # Always
+        finally:
+
+            # Get queued updates
+            updates = batches.updates
+
+            # End batch
+            batches.updates = None
+
+            # Write them
+            self.addMany(updates)
+
+
+
+    @contextlib.contextmanager
+    def snapshot(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            SNAPSHOT
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Freeze reports read by current thread within block: each one is
+            loaded from disk once, then shared by all later reads, and
+            updates are dropped. Meant for replaying history, where reports
+            are read over and over and must not be modified.
+        """
+
+        # Already frozen (outer snapshot is kept)
+        if getattr(snapshots, "reports", None) is not None:
+
+            # Run block
+            yield
+
+            # Exit
+            return
+
+        # Start snapshot
+        snapshots.reports = {}
+        snapshots.dates = {}
+
+        # Try
+        try:
+
+            # Run block
+            yield
+
+        # Always
+        finally:
+
+            # End snapshot
+            snapshots.reports = None
+            snapshots.dates = None
 
 
 
@@ -436,8 +803,8 @@ class Reporter:
         # Get dates of existing corresponding reports and exclude future ones
         dates = [d for d in self.getDates(name) if d <= today]
 
-        # Initialize dict for merged entries
-        entries = {}
+        # Initialize sections to merge
+        sections = []
 
         # Initialize number of reports merged
         N = 0
@@ -463,8 +830,8 @@ class Reporter:
                 # If section not empty
                 if section:
 
-                    # Merge entries
-                    entries = lib.mergeNDicts(entries, section)
+                    # Store it
+                    sections.append(section)
 
                     # Update number of reports merged
                     N += 1
@@ -475,8 +842,103 @@ class Reporter:
                 # Ignore
                 pass
 
-        # Return entries
-        return entries
+        # No entries
+        if not sections:
+
+            # Exit
+            return {}
+
+        # Merge sections in one pass (more recent ones first) and return
+        # entries
+        return lib.mergeNDicts({}, *sections)
+
+
+
+    def count(self, name, branch, key, n = 1):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            COUNT
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Increment counter in memory only. Pending increments are written
+            to their report(s) on commit.
+        """
+
+        # Make sure no other thread is updating counters at the same time
+        with lock:
+
+            # Get pending increments of report
+            entries = counts.setdefault(name, {})
+
+            # Define counter
+            counter = (tuple(branch), key)
+
+            # Increment it
+            entries[counter] = entries.get(counter, 0) + n
+
+
+
+    def commit(self, name = None):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            COMMIT
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Write pending counter increments to given report (or all of them),
+            using one locked read-modify-write per report, so increments from
+            other processes are not lost.
+        """
+
+        # Make sure no other thread is updating reports at the same time
+        with lock:
+
+            # No report given
+            if name is None:
+
+                # Commit all of them
+                names = counts.keys()
+
+            # Otherwise
+            else:
+
+                # Only commit given one
+                names = [name]
+
+            # Loop through reports
+            for name in names:
+
+                # Get pending increments
+                entries = counts.pop(name, None)
+
+                # None
+                if not entries:
+
+                    # Skip
+                    continue
+
+                # Load report with exclusive access
+                report = self.getReport(name, None, None, True, True)
+
+                # Try
+                try:
+
+                    # Loop through counters
+                    for (branch, key), n in entries.items():
+
+                        # Get section
+                        section = self.getSection(report, list(branch), True)
+
+                        # Update counter
+                        section[key] = section.get(key, 0) + n
+
+                    # Store report
+                    report.store()
+
+                # Always
+                finally:
+
+                    # Release report
+                    report.unlock()
 
 
 
@@ -488,17 +950,115 @@ class Reporter:
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
-        # Try reading value
-        n = self.get(name, branch, key)
+        # Count
+        self.count(name, branch, key)
+
+        # Write counter right away
+        self.commit(name)
+
+
+
+    def compact(self, name, year, month):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            COMPACT
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Move reports of given month into its archive. Reports are only
+            deleted once their archived version was verified.
+        """
+
+        # Get dates of report files of month
+        dates = sorted([d for d in [path.Path(d).date()
+                                    for d in self.src.scan(name)]
+                        if (d.year, d.month) == (year, month)])
+
+        # Nothing to compact
+        if not dates:
+
+            # Exit
+            return
+
+        # Give user info
+        Logger.info("Archiving " + str(len(dates)) + " day(s) of '" + name +
+                    "' (" + str(year) + "." + str(month).zfill(2) + ")...")
+
+        # Define archive
+        archive = archiver.Archive(self.src.str +
+                                   dates[0].strftime("%Y" + os.sep + "%m" +
+                                                     os.sep) +
+                                   self.getArchiveName(name))
+
+        # Initialize reports
+        reports = []
+
+        # Make sure no other thread is updating reports at the same time
+        with lock:
+
+            # Try
+            try:
+
+                # Load reports with exclusive access
+                for date in dates:
+
+                    # Load
+                    reports.append(self.getReport(name, date, None, False,
+                                                  True))
+
+                # Archive them
+                archive.write(dict(zip(dates, [r.json for r in reports])))
+
+                # Verify and delete them
+                for date, report in zip(dates, reports):
+
+                    # Archived version differs
+                    if not archiver.same(archive.day(date), report.json):
+
+                        # Error
+                        raise errors.BadArchive(name, date)
+
+                    # Delete report (its lock file stays: removing it while
+                    # held would let another process lock a new file of the
+                    # same name, and break mutual exclusion)
+                    os.remove(report.directory + report.name)
+
+            # Always
+            finally:
+
+                # Release reports
+                for report in reports:
+
+                    # Unlock
+                    report.unlock()
+
+
+
+    def archive(self, now):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            ARCHIVE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Compact all closed months (before current one) of archived
+            reports.
+        """
+
+        # Get first day of current month
+        today = now.date().replace(day = 1)
+
+        # Go through archived reports
+        for name in self.archived:
 
-        # If non-existent
-        if n is None:
+            # Get months of report files
+            months = set([(d.year, d.month) for d in
+                          [path.Path(d).date() for d in self.src.scan(name)]
+                          if d < today])
 
-            # Set to zero
-            n = 0
+            # Compact them
+            for year, month in sorted(months):
 
-        # Update value
-        self.add(name, branch, {key: n + 1}, True)
+                # Compact
+                self.compact(name, year, month)
 
 
 
@@ -518,6 +1078,9 @@ class Report:
         self.date = date
         self.json = json
 
+        # Initialize lock file
+        self.lockFile = None
+
 
 
     def reset(self):
@@ -574,6 +1137,67 @@ class Report:
 
 
 
+    def lock(self, exclusive = True, directory = None):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            LOCK
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Get shared (readers) or exclusive (writer) access to report across
+            processes, using a lock file next to it.
+        """
+
+        # Give user info
+        Logger.debug("Locking report: '" + self.name + "' (" + str(self.date) +
+                     ")")
+
+        # If no directory given
+        if directory is None:
+
+            # Use stored directory
+            directory = self.directory
+
+        # Open lock file
+        self.lockFile = open(directory + "." + self.name + ".lock", "a")
+
+        # Wait for lock
+        if exclusive:
+
+            # Exclusive
+            fcntl.flock(self.lockFile, fcntl.LOCK_EX)
+
+        else:
+
+            # Shared
+            fcntl.flock(self.lockFile, fcntl.LOCK_SH)
+
+
+
+    def unlock(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            UNLOCK
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Not locked
+        if self.lockFile is None:
+
+            # Exit
+            return
+
+        # Release lock
+        fcntl.flock(self.lockFile, fcntl.LOCK_UN)
+
+        # Close lock file
+        self.lockFile.close()
+
+        # Reset it
+        self.lockFile = None
+
+
+
     def load(self):
 
         """
@@ -586,9 +1210,27 @@ class Report:
         Logger.debug("Loading report: '" + self.name + "' (" + str(self.date) +
                      ")")
 
+        # Start timer
+        t0 = Metrics.now()
+
+        # Lock report while reading it, unless caller already did
+        locked = self.lockFile is None
+
         # Try opening report
         try:
 
+            # Report missing (do not leave a lock file behind for it)
+            if not os.path.exists(self.directory + self.name):
+
+                # Exit
+                raise IOError("No such file: " + self.directory + self.name)
+
+            # Shared access is enough
+            if locked:
+
+                # Lock
+                self.lock(False)
+
             # Open report
             with open(self.directory + self.name, "r") as f:
 
@@ -601,6 +1243,18 @@ class Report:
             # No report
             raise errors.NoReport(self.name, self.date)
 
+        # Always
+        finally:
+
+            # Release lock if taken here
+            if locked:
+
+                # Unlock
+                self.unlock()
+
+        # Update read timer
+        Metrics.time("Report Load", t0)
+
         # Give user info
         Logger.debug("Report loaded.")
 
@@ -624,14 +1278,47 @@ class Report:
             # Use stored directory
             directory = self.directory
 
-        # Rewrite report
-        with open(directory + self.name, "w") as f:
+        # Start timer
+        t0 = Metrics.now()
+
+        # Lock report while writing it, unless caller already did
+        locked = self.lockFile is None
+
+        # Exclusive access needed
+        if locked:
+
+            # Lock
+            self.lock(True, directory)
+
+        # Try
+        try:
+
+            # Define temporary file (unique to process)
+            tmp = directory + "." + self.name + "." + str(os.getpid()) + ".tmp"
+
+            # Write report to it
+            with open(tmp, "w") as f:
+
+                # Dump JSON
+                json.dump(self.json, f,
+                          indent = 4,
+                          separators = (",", ": "),
+                          sort_keys = True)
+
+            # Replace report with it (atomic: readers never see partial one)
+            os.rename(tmp, directory + self.name)
+
+        # Always
+        finally:
+
+            # Release lock if taken here
+            if locked:
+
+                # Unlock
+                self.unlock()
 
-            # Dump JSON
-            json.dump(self.json, f,
-                      indent = 4,
-                      separators = (",", ": "),
-                      sort_keys = True)
+        # Update write timer
+        Metrics.time("Report Store", t0)
 
 
 
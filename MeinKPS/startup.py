@@ -0,0 +1,125 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Title:    startup
+
+    Author:   David Leclerc
+
+    Version:  0.1
+
+    Date:     19.10.2026
+
+    License:  GNU General Public License, Version 3
+              (http://www.gnu.org/licenses/gpl.html)
+
+    Overview: This script measures how long a cold start of the loop takes
+              (new interpreter importing loop.py), and exits with a non-zero
+              status if it exceeds its budget or if heavy libraries that the
+              loop does not need (plotting, modelling) were imported.
+
+    Notes:    Usage: python startup.py [budget (s)]
+
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+
+# LIBRARIES
+import os
+import sys
+import time
+import subprocess
+
+
+
+# CONSTANTS
+BUDGET = 3.0
+N = 5
+FORBIDDEN = ["matplotlib", "scipy"]
+CODE = ("import sys; import loop; " +
+        "sys.stdout.write(' '.join(sys.modules.keys()))")
+
+
+
+def measure():
+
+    """
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        MEASURE
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        Import loop in a new interpreter and return time it took (s), as well
+        as names of loaded modules.
+    """
+
+    # Get starting time
+    t0 = time.time()
+
+    # Import loop from within its directory
+    modules = subprocess.check_output([sys.executable, "-c", CODE],
+        cwd = os.path.dirname(os.path.abspath(__file__)))
+
+    # Return import time and loaded modules
+    return [time.time() - t0, modules.split()]
+
+
+
+def main():
+
+    """
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        MAIN
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    """
+
+    # Read budget (s)
+    if len(sys.argv) > 1:
+
+        # Get it from user
+        budget = float(sys.argv[1])
+
+    # Otherwise
+    else:
+
+        # Use default one
+        budget = BUDGET
+
+    # Initialize import times
+    times = []
+
+    # Measure cold starts
+    for i in range(N):
+
+        # Measure
+        [t, modules] = measure()
+
+        # Store time
+        times.append(t)
+
+    # Only keep best time (least disturbed by other processes)
+    t = min(times)
+
+    # Give user info
+    print "Loop import time: " + str(round(t, 3)) + " s (budget: " + \
+          str(budget) + " s)"
+
+    # Find forbidden libraries which were imported
+    imported = [m for m in FORBIDDEN if m in modules]
+
+    # Give user info
+    for m in imported:
+
+        # Info
+        print "Loop should not import: " + m
+
+    # Fail if import too slow or forbidden libraries imported
+    if t > budget or imported:
+
+        # Exit
+        sys.exit(1)
+
+
+
+# Run this when script is called from terminal
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,8 @@
     License:  GNU General Public License, Version 3
               (http://www.gnu.org/licenses/gpl.html)
 
-    Overview: This is a script that uploads all reports to a server.
+    Overview: This is a script that uploads all reports to a server. Only
+              reports which changed since their last upload are transferred.
 
     Notes:    ...
 
@@ -23,13 +24,18 @@
 """
 
 # LIBRARIES
+import io
 import os
+import gzip
 import ftplib
+import hashlib
+import threading
 
 
 
 # USER LIBRARIES
 import logger
+import metrics
 import reporter
 
 
@@ -37,6 +43,7 @@ import reporter
 # Define instances
 Logger = logger.Logger("uploader.py")
 Reporter = reporter.Reporter()
+Metrics = metrics.Metrics()
 
 
 
@@ -51,72 +58,412 @@ class Uploader(object):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """
 
-        # Ignore
-        pass
+        # Define manifest report (uploaded files and remote directories)
+        self.report = "upload.json"
 
+        # Initialize manifest
+        self.manifest = None
 
+        # Initialize server configuration
+        self.config = None
 
-    def upload(self, ftp, path, ext = None):
+        # Initialize pool of open connections (kept between runs)
+        self.pool = []
+
+        # Define max number of connections (parallel uploads)
+        self.size = 3
+
+        # Define min number of files per connection
+        self.batch = 5
+
+        # Define lock for manifest updates (uploads may run in parallel)
+        self.lock = threading.Lock()
+
+
+
+    def load(self):
 
         """
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            UPLOAD
+            LOAD
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Load manifest
+        self.manifest = Reporter.getReport(self.report)
+
+        # Make sure it has all its sections
+        self.manifest.json.setdefault("Files", {})
+        self.manifest.json.setdefault("Directories", [])
+
+
+
+    def scan(self, path, ext = None, remote = ""):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            SCAN
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return files within path (local and remote paths, with their
+            hash, size and whether they are compressed) which changed since
+            their last upload.
         """
 
-        # Get all files from path
-        files = os.listdir(path)
+        # Initialize changed files
+        files = []
 
-        # Get inside path
-        os.chdir(path)
+        # Get uploaded files
+        uploaded = self.manifest.json["Files"]
 
-        # Upload files
-        for f in files:
+        # Go through files within path
+        for f in sorted(os.listdir(path)):
+
+            # Get local path
+            local = os.path.join(path, f)
 
             # If file
-            if os.path.isfile(f):
+            if os.path.isfile(local):
 
                 # Verify extension
-                if "." + ext != os.path.splitext(f)[1]:
+                if ext is not None and "." + ext != os.path.splitext(f)[1]:
 
                     # Skip file
                     continue
 
-                # Give user info
-                Logger.debug("Uploading: '" + os.getcwd() + "/" + f + "'")
+                # Read file
+                with open(local, "rb") as F:
+
+                    # Get content
+                    content = F.read()
 
-                # Open file
-                F = open(f, "r")
+                # Describe file (compressing changes its remote name)
+                entry = {"Hash": hashlib.md5(content).hexdigest(),
+                         "Size": len(content),
+                         "Gzip": bool(self.config.get("Gzip"))}
 
-                # Upload file
-                ftp.storlines("STOR " + f, F)
+                # If file changed since last upload
+                if uploaded.get(remote + f) != entry:
 
-                # Close file
-                F.close()
+                    # Store it
+                    files.append([local, remote + f, entry])
 
             # If directory
-            elif os.path.isdir(f):
+            elif os.path.isdir(local):
+
+                # Scan it as well
+                files.extend(self.scan(local, ext, remote + f + "/"))
+
+        # Return changed files
+        return files
+
+
+
+    def mkdir(self, ftp, remote):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            MKDIR
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Make sure directories leading to remote file exist. Known ones are
+            cached in manifest, so no remote listing is needed.
+        """
+
+        # Get known directories
+        directories = self.manifest.json["Directories"]
+
+        # Get directories leading to file
+        parts = remote.split("/")[:-1]
+
+        # Go through them
+        for i in range(len(parts)):
+
+            # Get directory
+            directory = "/".join(parts[:i + 1])
+
+            # Already known
+            if directory in directories:
+
+                # Skip
+                continue
+
+            # Give user info
+            Logger.debug("Making directory: '" + directory + "'")
+
+            # Try
+            try:
+
+                # Make directory
+                ftp.mkd(directory)
+
+            # Directory already exists
+            except ftplib.error_perm:
+
+                # Ignore
+                pass
+
+            # Remember it
+            with self.lock:
+
+                # Add directory
+                directories.append(directory)
+
+
+
+    def configure(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            CONFIGURE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Read server configuration (host, port, user, password, path and
+            whether to gzip files) once.
+        """
+
+        # Not read yet
+        if self.config is None:
+
+            # Read it
+            self.config = Reporter.get("FTP.json", [])
+
+
+
+    def connect(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            CONNECT
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Give user info
+        Logger.debug("Connecting to: '" + self.config["Host"] + "'")
+
+        # Instanciate an FTP object
+        ftp = ftplib.FTP()
+
+        # Connect
+        ftp.connect(self.config["Host"], self.config.get("Port", 21))
+
+        # Login
+        ftp.login(self.config["User"], self.config["Password"])
+
+        # Move to directory
+        ftp.cwd(self.config["Path"])
+
+        # Return connection
+        return ftp
+
+
+
+    def acquire(self):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            ACQUIRE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Return a working connection, reusing an open one if it is still
+            alive (keepalive), or opening a new one otherwise.
+        """
+
+        # Look for a reusable connection
+        while True:
+
+            # Get one from pool
+            with self.lock:
+
+                # None left
+                if not self.pool:
+
+                    # Stop looking
+                    break
+
+                # Take it
+                ftp = self.pool.pop()
+
+            # Try
+            try:
+
+                # Make sure it is still alive
+                ftp.voidcmd("NOOP")
+
+                # Return it
+                return ftp
+
+            # Connection lost
+            except ftplib.all_errors:
+
+                # Close it
+                ftp.close()
 
-                # If directory does not exist
-                if f not in ftp.nlst():
+        # Open a new connection
+        return self.connect()
+
+
+
+    def release(self, ftp):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            RELEASE
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Give connection back to pool, for it to be reused.
+        """
+
+        # Put connection back
+        with self.lock:
+
+            # Add it to pool
+            self.pool.append(ftp)
+
+
+
+    def transfer(self, ftp, local, remote):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            TRANSFER
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """
+
+        # Read file
+        with open(local, "rb") as F:
+
+            # Get content
+            content = F.read()
+
+        # If files should be compressed
+        if self.config.get("Gzip"):
+
+            # Initialize compressed content
+            buffer = io.BytesIO()
+
+            # Compress file (without timestamp, so content stays the same)
+            with gzip.GzipFile(fileobj = buffer, mode = "wb", mtime = 0) as G:
+
+                # Write content
+                G.write(content)
+
+            # Get compressed content
+            content = buffer.getvalue()
+
+            # Update remote filename
+            remote += ".gz"
+
+        # Make sure directories exist
+        self.mkdir(ftp, remote)
+
+        # Upload file
+        ftp.storbinary("STOR " + remote, io.BytesIO(content))
+
+
+
+    def upload(self, files, failures):
+
+        """
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            UPLOAD
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Upload files over one connection. If it fails, reconnect and try
+            again once. Files which still fail are left out of manifest (so
+            they are uploaded next run), and their errors added to given
+            failures (uploads may run in threads, which cannot raise them to
+            caller).
+        """
+
+        # Initialize connection
+        ftp = None
+
+        # Try
+        try:
+
+            # Upload files
+            for local, remote, entry in files:
+
+                # Give user info
+                Logger.debug("Uploading: '" + local + "'")
+
+                # Start timer
+                t0 = Metrics.now()
+
+                # Try
+                try:
+
+                    # No connection (first file, or previous one failed)
+                    if ftp is None:
+
+                        # Get one
+                        ftp = self.acquire()
+
+                    # Try
+                    try:
+
+                        # Upload file
+                        self.transfer(ftp, local, remote)
+
+                    # Connection failed
+                    except ftplib.all_errors as e:
+
+                        # Give user info
+                        Logger.warning("Upload failed (" + str(e) + "): " +
+                                       "reconnecting...")
+
+                        # Drop connection
+                        ftp.close()
+                        ftp = None
+
+                        # Reconnect
+                        ftp = self.connect()
+
+                        # Try again
+                        self.transfer(ftp, local, remote)
+
+                # Upload failed again
+                except Exception as e:
 
                     # Give user info
-                    Logger.debug("Making directory: '" + f + "'")
+                    Logger.error("Could not upload '" + local + "': " +
+                                 str(e))
 
-                    # Make directory
-                    ftp.mkd(f)
+                    # Remember error
+                    with self.lock:
 
-                # Move in directory
-                ftp.cwd(f)
+                        # Add it
+                        failures.append(e)
 
-                # Upload files in directory
-                self.upload(ftp, f, ext)
+                    # Drop connection (if any)
+                    if ftp is not None:
 
-        # Get back to original directory on server
-        ftp.cwd("..")
+                        # Close it
+                        ftp.close()
+                        ftp = None
 
-        # Locally as well
-        os.chdir("..")
+                    # Skip file
+                    continue
+
+                # Update upload timer
+                Metrics.time("Upload File", t0)
+
+                # Remember upload (only once it went through)
+                with self.lock:
+
+                    # Add file to manifest
+                    self.manifest.json["Files"][remote] = entry
+
+            # Connection still working
+            if ftp is not None:
+
+                # Give it back
+                self.release(ftp)
+                ftp = None
+
+        # Always
+        finally:
+
+            # Connection not given back (e.g. unexpected error)
+            if ftp is not None:
+
+                # Close it
+                ftp.close()
 
 
 
@@ -126,21 +473,78 @@ class Uploader(object):
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             RUN
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            Upload files which changed since last run. Many files (e.g. when
+            backfilling) are split over a few parallel connections.
         """
 
-        # Instanciate an FTP object
-        ftp = ftplib.FTP(Reporter.get("FTP.json", [], "Host"),
-                         Reporter.get("FTP.json", [], "User"),
-                         Reporter.get("FTP.json", [], "Password"))
+        # Load manifest
+        self.load()
 
-        # Move to directory
-        ftp.cwd(Reporter.get("FTP.json", [], "Path"))
+        # Read server configuration
+        self.configure()
+
+        # Find files which changed since last upload
+        files = self.scan(Reporter.exp.str, "json")
+
+        # Nothing to do
+        if not files:
+
+            # Info
+            Logger.info("Nothing new to upload.")
+
+            # Exit
+            return
+
+        # Initialize upload errors
+        failures = []
+
+        # Compute number of connections to use
+        n = max(1, min(self.size, len(files) / self.batch))
+
+        # Info
+        Logger.info("Uploading " + str(len(files)) + " file(s) over " +
+                    str(n) + " connection(s)...")
+
+        # Try
+        try:
+
+            # Single connection
+            if n == 1:
+
+                # Upload files
+                self.upload(files, failures)
 
-        # Define file paths
-        path = Reporter.exp.str
+            # Otherwise
+            else:
 
-        # Upload files within path
-        self.upload(ftp, path, "json")
+                # Split files between connections
+                threads = [threading.Thread(target = self.upload,
+                                            args = [files[i::n], failures])
+                           for i in range(n)]
+
+                # Start uploads
+                for thread in threads:
+
+                    # Start
+                    thread.start()
+
+                # Wait for them to be done
+                for thread in threads:
+
+                    # Join
+                    thread.join()
+
+        # Always
+        finally:
+
+            # Store manifest (even if only some files were uploaded)
+            self.manifest.store()
+
+        # Some uploads failed (their files will be uploaded next run)
+        if failures:
+
+            # Raise first error (all were logged)
+            raise failures[0]
 
 
 
@@ -152,6 +556,12 @@ def main():
     ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     """
 
+    # Instanciate an uploader
+    uploader = Uploader()
+
+    # Run it
+    uploader.run()
+
 
 
 # Run this when script is called from terminal
@@ -6,124 +6,327 @@
 ================================================================================
 Title:    readNightscout
 Author:   David Leclerc
-Version:  0.1
-Date:     26.05.2016
+Version:  0.2
+Date:     19.10.2026
 License:  GNU General Public License, Version 3
           (http://www.gnu.org/licenses/gpl.html)
-Overview: ...
-Notes:    ...
+Overview: Import historical BGs from a Nightscout site into MeinKPS' dated
+          reports (Reports/YYYY/MM/DD/BG.json).
+Notes:    - Usage: python readNightscout.py URL START [END] [--plot]
+            (dates as YYYY.MM.DD, END defaults to today)
+          - Entries are requested one day at a time (paged by date if a day
+            has more than PAGE entries), parsed line by line as they arrive,
+            and written in one go per day. Memory use does not depend on the
+            length of the imported period.
+          - BGs already in reports (e.g. read from CGM) are kept.
+          - Last imported day is remembered (import.json), so an interrupted
+            import resumes where it stopped.
 ================================================================================
 """
 
 
 
 # Import libraries
+import os
+import sys
+import time
 import datetime
 import requests
-import numpy as np
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-import matplotlib.dates as dates
-import json
 
 
 
-# Define start of acquisition
-now = datetime.datetime.now()
+# Import MeinKPS libraries
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                "..", "MeinKPS"))
+import lib
+import reporter
 
 
 
-# Define Nightscout URL
-url = "http://openaps30.herokuapp.com"
+# Define instances
+Reporter = reporter.Reporter()
 
 
 
+# Define number of entries per request
+PAGE = 1000
+
+# Define request timeout (s)
+TIMEOUT = 60
+
+# Define import progress report
+REPORT = "import.json"
+
+# Define date format
+DATE = "%Y.%m.%d"
+
 # Define BG scale
 bg_scale_mmol_l = {"High" : 12.0, "Target High" : 7.0, "Target Low" : 4.0}
-bg_scale_mg_dl = {i : int(18.0 * bg_scale_mmol_l[i]) for i in bg_scale_mmol_l}
-bg_scale = {"mmol/l" : bg_scale_mmol_l, "mg/dl" : bg_scale_mg_dl}
 
 
 
-# Define number of BG measurements wished
-units = "mmol/l"
-request = 1000
+def epoch(t):
+
+    """
+    Convert local time to epoch (ms), as used by Nightscout.
+    """
+
+    # Convert
+    return int(time.mktime(t.timetuple()) * 1000)
+
+
+
+def parse(day):
+
+    """
+    Convert date string (YYYY.MM.DD) to date.
+    """
+
+    # Convert
+    return datetime.datetime.strptime(day, DATE).date()
+
+
+
+def fetch(url, start, end):
+
+    """
+    Stream entries of given period [start, end) from Nightscout, newest
+    first, and yield them as (time, BG in mmol/L). Periods with more than
+    PAGE entries are paged by date. Pages overlap on the date of the oldest
+    entries of the previous page (entries sharing it may straddle pages), so
+    entries already yielded at that date are skipped.
+    """
+
+    # Initialize upper limit of page (end excluded)
+    lte = epoch(end) - 1
+
+    # Initialize entries already yielded at upper limit
+    seen = set()
+
+    # Page through period
+    while True:
+
+        # Request page (entries are sorted by date, newest first)
+        r = requests.get(url + "/api/v1/entries/sgv.txt",
+                         params = {"find[date][$gte]": epoch(start),
+                                   "find[date][$lte]": lte,
+                                   "count": PAGE},
+                         stream = True, timeout = TIMEOUT)
+
+        # Make sure request worked
+        r.raise_for_status()
+
+        # Initialize number of entries in page
+        n = 0
+
+        # Initialize oldest date in page, and entries found at it
+        oldest = lte
+        last = set()
+
+        # Parse lines as they arrive (dateString, date, sgv, ...)
+        for line in r.iter_lines():
+
+            # Skip empty lines
+            if not line:
+                continue
+
+            # Split line
+            columns = line.split("\t")
+
+            # Get date
+            date = int(columns[1])
+
+            # Update page info
+            n += 1
+
+            # Older date
+            if date < oldest:
+                oldest = date
+                last = set()
+
+            # Remember entries at oldest date
+            if date == oldest:
+                last.add(line)
+
+            # Already yielded by previous page
+            if date == lte and line in seen:
+                continue
+
+            # Yield entry
+            yield (datetime.datetime.fromtimestamp(date / 1000),
+                   round(float(columns[2]) / 18.0, 1))
+
+        # Last page
+        if n < PAGE:
+            break
+
+        # Whole page within one millisecond (cannot page within it)
+        if oldest == lte:
+            lte -= 1
+            seen = set()
+
+        # Otherwise, start next page at oldest date again
+        else:
+            lte = oldest
+            seen = last
+
+
+
+def load(url, day):
+
+    """
+    Import BGs of given day and store them in its report.
+    """
+
+    # Define period
+    start = datetime.datetime.combine(day, datetime.time())
+    end = start + datetime.timedelta(days = 1)
+
+    # Collect day's entries (ignore sub-second duplicates)
+    entries = dict((t.replace(microsecond = 0), BG)
+                   for t, BG in fetch(url, start, end))
+
+    # Store them in one go (keep BGs already there)
+    Reporter.add("BG.json", [], entries)
+
+    # Remember progress
+    Reporter.add(REPORT, ["Nightscout"], {"Last Day": day.strftime(DATE)},
+                 True)
+
+    # Return number of entries
+    return len(entries)
+
+
+
+def run(url, start, end):
+
+    """
+    Import BGs day by day, resuming after last imported day if possible.
+    """
+
+    # Try
+    try:
+
+        # Read last imported day
+        last = parse(Reporter.get(REPORT, ["Nightscout"], "Last Day"))
+
+        # Resume after it (last day is redone in case it was partial)
+        start = max(start, last)
+
+    # Nothing imported yet
+    except Exception:
+        pass
+
+    # Initialize day
+    day = start
+
+    # Go through days
+    while day <= end:
+
+        # Import it
+        n = load(url, day)
+
+        # Give user info
+        print "Imported " + str(n) + " BG(s) for: " + day.strftime(DATE)
+
+        # Next day
+        day += datetime.timedelta(days = 1)
+
+
+
+def plot(day):
+
+    """
+    Plot BGs of given day, as stored in its report.
+    """
 
+    # Import plotting libraries (only needed here)
+    import matplotlib as mpl
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as dates
 
+    # Read BGs
+    BGs = Reporter.getRecent(datetime.datetime.combine(day, datetime.time()),
+                             "BG.json", [], 1, True)
 
-# Retrieve source code containing BG values to Nightscout API endpoint "ENTRIES"
-source_code = requests.get(url + "/api/v1/entries?count=" + str(request)).text
+    # Sort them
+    t = [lib.formatTime(T) for T in sorted(BGs)]
+    BG = [BGs[T] for T in sorted(BGs)]
 
+    # Initialize plot
+    mpl.rc("font", size = 11, family = "Ubuntu")
+    fig = plt.figure(0, figsize = (12, 10))
+    sp = plt.subplot(111)
 
+    # Define plot title
+    sp.set_title("BG values imported from Nightscout on " +
+                 day.strftime(DATE), weight = "semibold")
 
-# Extract BG values from source code
-t = np.array([datetime.datetime.strptime(i[0], "%Y-%m-%dT%H:%M:%S.000Z")
-    for i in [j.split("\t") for j in source_code.split("\n")]])
-BG_mg_dl = np.array([i[2] for i in [j.split("\t")
-    for j in source_code.split("\n")]], float)
-BG_mmol_l = BG_mg_dl / 18.0
-BG = {"mmol/l" : BG_mmol_l, "mg/dl" : BG_mg_dl}
+    # Define plot axis
+    sp.set_xlabel("Time", weight = "semibold")
+    sp.set_ylabel("BG (mmol/l)", weight = "semibold")
 
+    # Add grid to plot
+    sp.grid(color = "grey")
 
+    # Add target limits
+    sp.axhline(bg_scale_mmol_l["Target Low"], ls = "--", lw = 1.5, c = "grey")
+    sp.axhline(bg_scale_mmol_l["Target High"], ls = "--", lw = 1.5,
+               c = "orange")
+    sp.axhline(bg_scale_mmol_l["High"], ls = "--", lw = 1.5, c = "red")
 
-# Actual number of measurements imported
-count = len(t)
+    # Plot BG values and corresponding times
+    sp.plot(t, BG, ls = "-", lw = 1.5, c = "black")
 
+    # Add time ticks to x-axis
+    sp.xaxis.set_major_locator(dates.HourLocator(interval = 3))
+    sp.xaxis.set_major_formatter(dates.DateFormatter("%H:%M"))
 
+    # Format x-axis for beautiful displaying of dates!
+    for tick in sp.get_xticklabels():
+        tick.set_rotation(45)
 
-# Save BG values to JSON file
-report = {}
+    # Tighten everything up!
+    fig.tight_layout()
 
-for i in range(count):
-    T = datetime.datetime.strftime(t[i], "%Y.%m.%d - %H:%M:%S")
-    report[T] = round(BG_mmol_l[i], 1)
+    # Show plot
+    plt.show()
 
-with open("BG.json", "w") as f:
-    json.dump(report, f, indent = 4, separators = (",", ": "), sort_keys = True)
 
 
+def main():
 
-# Initialize plot
-mpl.rc("font", size = 11, family = "Ubuntu")
-fig = plt.figure(0, figsize = (12, 10))
-sp = plt.subplot(111)
+    """
+    Read arguments and import BGs.
+    """
 
-# Define plot title
-sp.set_title("Last " + str(count) + " BG values imported from Nightscout" +
-             " webpage " + url + ", starting on " + now.strftime("%Y.%m.%d") +
-             " at " + now.strftime("%H:%M"), weight = "semibold")
+    # Read options
+    show = "--plot" in sys.argv
+    args = [a for a in sys.argv[1:] if a != "--plot"]
 
-# Define plot axis
-sp.set_xlabel("Time", weight = "semibold")
-sp.set_ylabel("BG (" + units + ")", weight = "semibold")
+    # Read Nightscout URL
+    url = args[0].rstrip("/")
 
-# Add grid to plot
-sp.grid(color = "grey")
+    # Read period
+    start = parse(args[1])
 
-# Add target limits
-sp.plot(t, bg_scale[units]["Target Low"] * np.ones(len(t)),
-    ls = "--", lw = 1.5, c = "grey")
-sp.plot(t, bg_scale[units]["Target High"] * np.ones(len(t)),
-    ls = "--", lw = 1.5, c = "orange")
-sp.plot(t, bg_scale[units]["High"] * np.ones(len(t)),
-    ls = "--", lw = 1.5, c = "red")
+    # End given
+    if len(args) > 2:
+        end = parse(args[2])
 
-# Plot BG values and corresponding times
-sp.plot(t, BG[units], ls = "-", lw = 1.5, c = "black")
+    # Otherwise, import until today
+    else:
+        end = datetime.date.today()
 
-# Add time ticks to x-axis
-sp.xaxis.set_major_locator(dates.HourLocator(interval = 3))
-sp.xaxis.set_major_formatter(dates.DateFormatter("%H:%M"))
+    # Import BGs
+    run(url, start, end)
 
-# Change background color of plot
-#sp.set_axis_bgcolor("black")
+    # Plot last imported day
+    if show:
+        plot(end)
 
-# Format x-axis for beautiful displaying of dates!
-for tick in sp.get_xticklabels():
-    tick.set_rotation(45)
 
-# Tighten everything up!
-fig.tight_layout()
 
-# Show plot
-plt.show()
+# Run this when script is called from terminal
+if __name__ == "__main__":
+    main()